@@ -0,0 +1,323 @@
+"""
+Load test for every route of the API against a database filled by seed.py.
+
+Two drivers:
+
+    client  the Flask test client, in process. No network or server in the way,
+            so it measures the application code and the database.
+    http    real HTTP requests against gunicorn. Use --url for a server that is
+            already running, or --spawn to start one with gunicorn.conf.py on
+            the same database.
+
+For each scenario it reports throughput, p50/p95/p99 latency and SQL queries
+per request (read from the Server-Timing header, so PERF_INSTRUMENTATION must
+be on). Results can be saved as JSON and compared against an earlier run:
+
+    python benchmarks/seed.py --scale 10000
+    python benchmarks/load.py --output baseline.json
+    python benchmarks/load.py --driver http --spawn --concurrency 16 --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+DEFAULT_DATABASE_URL = "sqlite:////tmp/bench.db"
+BENCH_EMAIL = "user1@bench.local"
+BENCH_PASSWORD = "password"
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def scenarios(sizes, token):
+    """(name, method, path, body, needs auth) for every route.
+
+    The write scenarios come in pairs that undo each other (add then remove
+    favorites) so the database ends the run as it started.
+    """
+    people, planets, vehicles = sizes["people"], sizes["planets"], sizes["vehicles"]
+
+    def pick(total):
+        return lambda i: i * 7919 % total + 1
+
+    person, planet, vehicle = pick(people), pick(planets), pick(vehicles)
+    # ids que el usuario de prueba (user 1) no tiene como favoritos en el seed
+    free_people = lambda i: people - i % max(people // 2, 1)
+    stamp = int(time.time())
+    return [
+        ("index", "GET", lambda i: "/", None, False),
+        ("people_page", "GET", lambda i: "/people?limit=100", None, False),
+        ("people_page_after", "GET", lambda i: "/people?limit=100&after=%d" % person(i), None, False),
+        ("people_fields", "GET", lambda i: "/people?fields=name&limit=100", None, False),
+        ("people_filter", "GET", lambda i: "/people?gender=female&height_gte=150&limit=100", None, False),
+        ("people_stream", "GET", lambda i: "/people?stream=1&limit=1000", None, False),
+        ("planets_page", "GET", lambda i: "/planets?limit=100", None, False),
+        ("vehicles_page", "GET", lambda i: "/vehicles?limit=100", None, False),
+        ("users_page", "GET", lambda i: "/users", None, False),
+        ("people_detail", "GET", lambda i: "/people/%d" % person(i), None, False),
+        ("planets_detail", "GET", lambda i: "/planets/%d" % planet(i), None, False),
+        ("vehicles_detail", "GET", lambda i: "/vehicles/%d" % vehicle(i), None, False),
+        ("people_top", "GET", lambda i: "/people/top?n=10", None, False),
+        ("planets_top", "GET", lambda i: "/planets/top?n=10", None, False),
+        ("vehicles_top", "GET", lambda i: "/vehicles/top?n=10", None, False),
+        ("search", "GET", lambda i: "/search?q=lu&limit=20", None, False),
+        ("favorites", "GET", lambda i: "/favorites", None, True),
+        ("favorite_add", "POST", lambda i: "/favorite/people/%d" % free_people(i), None, True),
+        ("favorite_remove", "DELETE", lambda i: "/favorite/people/%d" % free_people(i), None, True),
+        ("bulk_add", "POST", lambda i: "/favorites/bulk",
+         lambda i: {"items": [{"type": "planet", "resource_id": planet(i * 10 + k)} for k in range(10)]}, True),
+        ("bulk_remove", "DELETE", lambda i: "/favorites/bulk",
+         lambda i: {"items": [{"type": "planet", "resource_id": planet(i * 10 + k)} for k in range(10)]}, True),
+        ("login", "POST", lambda i: "/login", lambda i: {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}, False),
+        ("signup", "POST", lambda i: "/signup", lambda i: {
+            "email": "bench-%d-%d@bench.local" % (stamp, i), "password": BENCH_PASSWORD,
+            "first_name": "Bench", "last_name": str(i)}, False),
+        ("metrics", "GET", lambda i: "/metrics", None, False),
+        ("metrics_pool", "GET", lambda i: "/metrics/pool", None, False),
+    ]
+
+
+class ClientDriver:
+
+    def __init__(self):
+        from app import app
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code, response.headers.get("Server-Timing")
+
+    def close(self):
+        pass
+
+
+class HTTPDriver:
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def request(self, method, path, body, headers):
+        data = None
+        headers = dict(headers)
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get("Server-Timing")
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get("Server-Timing")
+
+    def close(self):
+        pass
+
+
+class GunicornDriver(HTTPDriver):
+    """HTTPDriver against a gunicorn started for the run and stopped at the end."""
+
+    def __init__(self, database_url, port):
+        super().__init__("http://127.0.0.1:%d" % port)
+        env = dict(os.environ, DATABASE_URL=database_url, PORT=str(port))
+        self.process = subprocess.Popen(
+            ["gunicorn", "-c", "gunicorn.conf.py", "wsgi", "--chdir", "./src/"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(self.url + "/", timeout=1).read()
+                return
+            except OSError:
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.2)
+        self.close()
+        raise SystemExit("gunicorn did not start on port %d" % port)
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(driver, scenario, requests, concurrency, token):
+    name, method, path, body, needs_auth = scenario
+    headers = {"Authorization": "Bearer " + token} if needs_auth else {}
+
+    def one(i):
+        start = time.perf_counter()
+        status, timing = driver.request(method, path(i), body(i) if body else None, headers)
+        elapsed = time.perf_counter() - start
+        match = QUERIES_RE.search(timing or "")
+        return elapsed, status, int(match.group(1)) if match else None
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(one, range(requests)))
+    else:
+        samples = [one(i) for i in range(requests)]
+    wall = time.perf_counter() - start
+
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[2] for s in samples if s[2] is not None]
+    return {
+        "method": method,
+        "requests": requests,
+        "errors": sum(1 for s in samples if s[1] >= 500),
+        "statuses": sorted({s[1] for s in samples}),
+        "throughput_rps": round(requests / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def table_sizes():
+    from sqlalchemy import func, select
+    from app import app
+    from models import db, People, Planets, Vehicles
+    with app.app_context():
+        return {
+            "people": db.session.scalar(select(func.count(People.id))),
+            "planets": db.session.scalar(select(func.count(Planets.id))),
+            "vehicles": db.session.scalar(select(func.count(Vehicles.id))),
+        }
+
+
+def login(driver):
+    body = {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}
+    if isinstance(driver, ClientDriver):
+        response = driver.client.post("/login", json=body)
+        token = (response.get_json() or {}).get("access_token")
+    else:
+        req = urllib.request.Request(
+            driver.url + "/login", data=json.dumps(body).encode("utf-8"),
+            method="POST", headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=60) as response:
+            token = json.loads(response.read()).get("access_token")
+    if not token:
+        raise SystemExit("could not log in as %s, was the database seeded with benchmarks/seed.py?" % BENCH_EMAIL)
+    return token
+
+
+def compare(results, baseline):
+    print()
+    print("%-20s %12s %12s %10s" % ("vs baseline", "rps", "p95", "queries"))
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+
+        def change(key, lower_is_better=True):
+            old, new = before.get(key), current.get(key)
+            if not old or new is None:
+                return "-"
+            pct = (new - old) / old * 100
+            better = pct < 0 if lower_is_better else pct > 0
+            return "%+.1f%%%s" % (pct, "" if abs(pct) < 5 else (" ok" if better else " !!"))
+
+        old_q, new_q = before.get("queries_per_request"), current.get("queries_per_request")
+        queries = "-" if old_q is None or new_q is None else "%+g" % round(new_q - old_q, 2)
+        print("%-20s %12s %12s %10s" % (
+            name, change("throughput_rps", lower_is_better=False), change("p95_ms"), queries))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against a seeded database.")
+    parser.add_argument("--driver", choices=("client", "http"), default="client")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server for --driver http")
+    parser.add_argument("--spawn", action="store_true", help="start gunicorn for --driver http")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --output")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # la misma clave para el proceso y los workers de --spawn
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-not-for-production")
+    sys.path.insert(0, SRC)
+
+    sizes = table_sizes()
+    if not all(sizes.values()):
+        raise SystemExit("empty database, run benchmarks/seed.py first")
+
+    if args.driver == "client":
+        driver = ClientDriver()
+    elif args.spawn:
+        driver = GunicornDriver(args.database_url, args.port)
+    else:
+        driver = HTTPDriver(args.url)
+
+    results = {}
+    try:
+        token = login(driver)
+        print("%-20s %8s %10s %9s %9s %9s %8s" % ("scenario", "status", "rps", "p50 ms", "p95 ms", "p99 ms", "queries"))
+        for scenario in scenarios(sizes, token):
+            if args.only and scenario[0] not in args.only:
+                continue
+            result = run_scenario(driver, scenario, args.requests, args.concurrency, token)
+            results[scenario[0]] = result
+            print("%-20s %8s %10.1f %9.2f %9.2f %9.2f %8s" % (
+                scenario[0], ",".join(map(str, result["statuses"])), result["throughput_rps"],
+                result["p50_ms"], result["p95_ms"], result["p99_ms"],
+                "-" if result["queries_per_request"] is None else result["queries_per_request"],
+            ))
+    finally:
+        driver.close()
+
+    report = {
+        "meta": {
+            "driver": args.driver,
+            "database": args.database_url.split("@")[-1],
+            "sizes": sizes,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("\nresults written to", args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmark for the /login hashing cost.
+
+Reports how many password verifications per second one core can do for each
+PASSWORD_HASH_METHOD candidate, so the work factor can be picked against the
+expected login rate:
+
+    python benchmarks/password_hashing.py
+    python benchmarks/password_hashing.py --seconds 5 scrypt:16384:8:1 pbkdf2:sha256:600000
+"""
+import argparse
+import time
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHODS = [
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+]
+
+
+def logins_per_second(method, seconds):
+    stored = generate_password_hash("correct horse battery staple", method)
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        check_password_hash(stored, "correct horse battery staple")
+        done += 1
+    elapsed = time.perf_counter() - start
+    return done / elapsed, elapsed / done * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("methods", nargs="*", default=DEFAULT_METHODS)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on each method")
+    args = parser.parse_args()
+
+    print("%-24s %14s %10s" % ("method", "logins/s/core", "ms/login"))
+    for method in args.methods:
+        rate, ms = logins_per_second(method, args.seconds)
+        print("%-24s %14.1f %10.2f" % (method, rate, ms))
+
+
+if __name__ == "__main__":
+    main()
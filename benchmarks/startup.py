@@ -0,0 +1,154 @@
+"""
+Cold start of a worker: time from importing the app to its first answered
+request, per role (see create_app in src/app.py).
+
+Every run is a fresh interpreter, so nothing is imported yet, the same as a
+gunicorn worker the autoscaler just started. Each run reports:
+
+    import   import app (the module and everything it pulls in)
+    create   create_app(role): config, extensions, routes
+    first    the first request through the test client (opens the first
+             database connection)
+    total    import + create + first
+    process  wall time of the whole process as seen from outside,
+             interpreter start up included
+
+With --gunicorn it starts a one-worker gunicorn per run instead and measures
+from spawning it to the first answered HTTP request.
+
+    python benchmarks/seed.py --scale 1000
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --gunicorn --roles api
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC = os.path.join(ROOT, "src")
+DEFAULT_DATABASE_URL = "sqlite:////tmp/bench.db"
+PHASES = ("import", "create", "first", "total", "process")
+
+# corre en un intérprete nuevo por medición
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+app = module.create_app(sys.argv[2])
+created = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+served = time.perf_counter()
+print(json.dumps({
+    "status": status,
+    "import": (imported - start) * 1000,
+    "create": (created - imported) * 1000,
+    "first": (served - created) * 1000,
+    "total": (served - start) * 1000,
+}))
+"""
+
+
+def probe_once(role, path, env):
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", PROBE, path, role], cwd=SRC, env=env, text=True)
+    sample = json.loads(output.strip().splitlines()[-1])
+    sample["process"] = (time.perf_counter() - start) * 1000
+    return sample
+
+
+def gunicorn_once(role, path, env, port):
+    env = dict(env, PORT=str(port), GUNICORN_WORKERS="1")
+    url = "http://127.0.0.1:%d%s" % (port, path)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        ["gunicorn", "-c", "gunicorn.conf.py", "wsgi", "--chdir", "./src/"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    status = response.status
+                break
+            except urllib.error.HTTPError as e:
+                status = e.code
+                break
+            except OSError:
+                if process.poll() is not None:
+                    raise SystemExit("gunicorn exited while starting (APP_ROLE=%s)" % role)
+                time.sleep(0.005)
+        else:
+            raise SystemExit("gunicorn did not answer on port %d" % port)
+        return {"status": status, "process": (time.perf_counter() - start) * 1000}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(samples):
+    summary = {"statuses": sorted({s["status"] for s in samples})}
+    for phase in PHASES:
+        values = sorted(s[phase] for s in samples if phase in s)
+        if values:
+            summary[phase + "_ms"] = {
+                "median": round(values[len(values) // 2], 1),
+                "min": round(values[0], 1),
+                "max": round(values[-1], 1),
+            }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import-to-first-request time per app role.")
+    parser.add_argument("--roles", nargs="*", default=["api", "admin"])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per role")
+    parser.add_argument("--path", default="/people/1", help="the first request")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--gunicorn", action="store_true", help="time a spawned gunicorn worker instead")
+    parser.add_argument("--port", type=int, default=8766, help="port for --gunicorn")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env.setdefault("JWT_SECRET_KEY", "startup-benchmark")
+
+    results = {}
+    print("%-8s %8s %10s %10s %10s %10s %10s" % ("role", "status", *(p + " ms" for p in PHASES)))
+    for role in args.roles:
+        role_env = dict(env, APP_ROLE=role)
+        samples = []
+        for _ in range(args.runs):
+            if args.gunicorn:
+                samples.append(gunicorn_once(role, args.path, role_env, args.port))
+            else:
+                samples.append(probe_once(role, args.path, role_env))
+        results[role] = summary = summarize(samples)
+        print("%-8s %8s %s" % (role, ",".join(map(str, summary["statuses"])), " ".join(
+            "%10s" % (summary[p + "_ms"]["median"] if p + "_ms" in summary else "-") for p in PHASES)))
+
+    report = {
+        "meta": {
+            "mode": "gunicorn" if args.gunicorn else "process",
+            "database": args.database_url.split("@")[-1],
+            "runs": args.runs,
+            "path": args.path,
+            "date": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("\nresults written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
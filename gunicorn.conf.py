@@ -0,0 +1,66 @@
+# Gunicorn settings, read with `gunicorn -c gunicorn.conf.py` (see Procfile).
+#
+# GUNICORN_WORKER_CLASS=sync   (default) one request per worker at a time.
+# GUNICORN_WORKER_CLASS=gevent each worker serves up to GUNICORN_WORKER_CONNECTIONS
+#                              requests as greenlets; a request waiting on the
+#                              database yields to the others instead of blocking.
+#
+# In gevent mode db.session stays safe: Flask-SQLAlchemy scopes the session to
+# the app context of each request and every greenlet gets its own context, so
+# two requests never share a session. They do share the worker's connection
+# pool, so DB_POOL_SIZE + DB_MAX_OVERFLOW is the real limit of concurrent
+# queries per worker; the rest wait up to DB_POOL_TIMEOUT seconds.
+#
+# APP_ROLE=api   workers that only serve the API skip Flask-Admin and
+#                Flask-Migrate and start faster (see create_app in app.py);
+#                keep one deployment with the default APP_ROLE=admin for
+#                /admin and `flask db upgrade`.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+
+if worker_class == "gevent":
+    # con gevent la concurrencia está en las conexiones, no en los procesos
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+else:
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+bind = "0.0.0.0:" + os.getenv("PORT", "8000")
+
+# /metrics suma todos los workers (ver src/metrics.py); un directorio por servidor
+# para que dos gunicorn en la misma máquina no se pisen los archivos
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-%d" % os.getpid()))
+
+
+def post_worker_init(worker):
+    # corre después de que el worker gevent hizo el monkey-patching
+    if worker_class != "gevent" or not os.getenv("DATABASE_URL", "").startswith("postgres"):
+        return
+    # psycopg2 es una extensión en C: sin esto cada consulta bloquea a todo el worker.
+    # mysqlclient no tiene soporte green; con MySQL usar workers sync.
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        worker.log.warning("psycogreen/psycopg2 not importable: Postgres queries will block the gevent worker")
+        return
+    patch_psycopg()
+
+
+def on_starting(server):
+    # las métricas de Prometheus de cada worker se escriben en este directorio;
+    # se borran solo sus .db de la corrida anterior, no lo que el operador tenga ahí
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, "*.db")):
+        os.remove(name)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,7 @@
 from __future__ import with_statement
 
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -32,6 +33,18 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Índices de búsqueda creados a mano en d41c2e7b9a10 (tablas FTS5 de SQLite,
+# índices GIN de Postgres): no están en los modelos y autogenerate los borraría
+SEARCH_OBJECTS = re.compile(r'^(people|planets|vehicles)_fts(_\w+)?$|^ix_(people|planets|vehicles)_name_(tsv|trgm)$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if reflected and compare_to is None and type_ in ('table', 'index'):
+        if SEARCH_OBJECTS.match(name or ''):
+            return False
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -52,7 +65,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -84,6 +98,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,43 @@
+"""vehicle favorites and the vehicles favorites_count counter
+
+Revision ID: 3b8e1f6c2d47
+Revises: 803579affa47
+Create Date: 2026-10-18 14:21:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e1f6c2d47'
+down_revision = '803579affa47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 522ffdc10918 había borrado la columna; vuelve con su índice único como people/planet
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vehicle_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('favorites_vehicle_id_fkey', 'vehicles', ['vehicle_id'], ['id'])
+        batch_op.create_index('uq_favorites_user_vehicle', ['user_id', 'vehicle_id'], unique=True,
+                              postgresql_where=sa.text('vehicle_id IS NOT NULL'),
+                              sqlite_where=sa.text('vehicle_id IS NOT NULL'))
+        batch_op.create_index('ix_favorites_vehicle_id', ['vehicle_id'], unique=False)
+
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('favorites_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_vehicles_favorites_count', ['favorites_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('vehicles', schema=None) as batch_op:
+        batch_op.drop_index('ix_vehicles_favorites_count')
+        batch_op.drop_column('favorites_count')
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_vehicle_id')
+        batch_op.drop_index('uq_favorites_user_vehicle')
+        batch_op.drop_constraint('favorites_vehicle_id_fkey', type_='foreignkey')
+        batch_op.drop_column('vehicle_id')
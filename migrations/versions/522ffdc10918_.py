@@ -16,9 +16,14 @@ branch_labels = None
 depends_on = None
 
 
+# SQLite no guarda nombre para las FK de la tabla original: en modo batch les
+# damos el mismo que pone Postgres para poder borrarla
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
 def upgrade():
     # ### commands auto generated by Alembic - please adjust! ###
-    with op.batch_alter_table('favorites', schema=None) as batch_op:
+    with op.batch_alter_table('favorites', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
         batch_op.drop_constraint('favorites_vehicle_id_fkey', type_='foreignkey')
         batch_op.drop_column('vehicle_id')
 
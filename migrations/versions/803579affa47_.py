@@ -0,0 +1,40 @@
+"""favorites_count counters for the people / planets leaderboards
+
+Revision ID: 803579affa47
+Revises: d41c2e7b9a10
+Create Date: 2026-10-18 12:02:15.660148
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '803579affa47'
+down_revision = 'd41c2e7b9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('favorites_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_people_favorites_count', ['favorites_count', 'id'], unique=False)
+
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('favorites_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index('ix_planets_favorites_count', ['favorites_count', 'id'], unique=False)
+
+    # Carga inicial de los contadores
+    op.execute("UPDATE people SET favorites_count = (SELECT COUNT(*) FROM favorites WHERE favorites.people_id = people.id)")
+    op.execute("UPDATE planets SET favorites_count = (SELECT COUNT(*) FROM favorites WHERE favorites.planet_id = planets.id)")
+
+
+def downgrade():
+    with op.batch_alter_table('planets', schema=None) as batch_op:
+        batch_op.drop_index('ix_planets_favorites_count')
+        batch_op.drop_column('favorites_count')
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.drop_index('ix_people_favorites_count')
+        batch_op.drop_column('favorites_count')
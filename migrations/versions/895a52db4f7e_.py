@@ -0,0 +1,35 @@
+"""table_versions for ETag / Last-Modified
+
+Revision ID: 895a52db4f7e
+Revises: 522ffdc10918
+Create Date: 2026-10-18 09:12:40.118301
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '895a52db4f7e'
+down_revision = '522ffdc10918'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    op.bulk_insert(table_versions, [
+        {'name': name, 'version': 1, 'updated_at': now}
+        for name in ('people', 'planets', 'vehicles')
+    ])
+
+
+def downgrade():
+    op.drop_table('table_versions')
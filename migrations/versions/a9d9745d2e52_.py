@@ -0,0 +1,44 @@
+"""favorites indexes and per-user uniqueness
+
+Revision ID: a9d9745d2e52
+Revises: 895a52db4f7e
+Create Date: 2026-10-18 10:03:27.540912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d9745d2e52'
+down_revision = '895a52db4f7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Antes de crear los índices únicos borramos los favoritos repetidos,
+    # quedándonos con el más antiguo de cada (user_id, people_id, planet_id).
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN ("
+        " SELECT id FROM (SELECT MIN(id) AS id FROM favorites"
+        " GROUP BY user_id, people_id, planet_id) AS keep)"
+    )
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('uq_favorites_user_people', ['user_id', 'people_id'], unique=True,
+                              postgresql_where=sa.text('people_id IS NOT NULL'),
+                              sqlite_where=sa.text('people_id IS NOT NULL'))
+        batch_op.create_index('uq_favorites_user_planet', ['user_id', 'planet_id'], unique=True,
+                              postgresql_where=sa.text('planet_id IS NOT NULL'),
+                              sqlite_where=sa.text('planet_id IS NOT NULL'))
+        batch_op.create_index('ix_favorites_people_id', ['people_id'], unique=False)
+        batch_op.create_index('ix_favorites_planet_id', ['planet_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_planet_id')
+        batch_op.drop_index('ix_favorites_people_id')
+        batch_op.drop_index('uq_favorites_user_planet')
+        batch_op.drop_index('uq_favorites_user_people')
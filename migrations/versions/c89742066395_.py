@@ -0,0 +1,32 @@
+"""widen users.password for hashed passwords
+
+Revision ID: c89742066395
+Revises: a9d9745d2e52
+Create Date: 2026-10-18 10:41:06.277314
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c89742066395'
+down_revision = 'a9d9745d2e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=80),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=80),
+               existing_nullable=False)
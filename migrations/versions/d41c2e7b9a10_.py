@@ -0,0 +1,72 @@
+"""search and filter indexes for people, planets and vehicles
+
+Revision ID: d41c2e7b9a10
+Revises: c89742066395
+Create Date: 2026-10-18 11:20:52.803417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41c2e7b9a10'
+down_revision = 'c89742066395'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = ('people', 'planets', 'vehicles')
+
+
+def upgrade():
+    # Índices de los filtros por columna (/people?gender=..., /planets?climate=...)
+    op.create_index('ix_people_gender', 'people', ['gender'], unique=False)
+    op.create_index('ix_people_height', 'people', ['height'], unique=False)
+    op.create_index('ix_planets_climate', 'planets', ['climate'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table in SEARCH_TABLES:
+            op.execute(f"CREATE INDEX ix_{table}_name_tsv ON {table} USING gin (to_tsvector('simple', name))")
+            op.execute(f"CREATE INDEX ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)")
+
+    elif dialect == 'sqlite':
+        # FTS5 con contenido externo: el índice lee la tabla original y los
+        # triggers lo mantienen al día en cada insert / delete y cuando cambia
+        # el nombre (favorites_count y los upserts del importador no lo tocan)
+        for table in SEARCH_TABLES:
+            fts = table + '_fts'
+            op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5(name, content='{table}', content_rowid='id')")
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            op.execute(f"""CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name);
+            END""")
+            op.execute(f"""CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name);
+            END""")
+            op.execute(f"""CREATE TRIGGER {fts}_au AFTER UPDATE OF name ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.id, old.name);
+                INSERT INTO {fts}(rowid, name) VALUES (new.id, new.name);
+            END""")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table in SEARCH_TABLES:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_name_trgm")
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_name_tsv")
+
+    elif dialect == 'sqlite':
+        for table in SEARCH_TABLES:
+            fts = table + '_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
+
+    op.drop_index('ix_planets_climate', table_name='planets')
+    op.drop_index('ix_people_height', table_name='people')
+    op.drop_index('ix_people_gender', table_name='people')
@@ -1,12 +1,27 @@
 import os
 from flask_admin import Admin
-from models import db, People, Planets, Users, Favorites
+from models import db, People, Planets, Vehicles, Users, Favorites
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import inspect
+from favorites import FAVORITE_TYPES, adjust_favorite_counts
 
 # Clase personalizada para mostrar favoritos
 class FavoriteView(ModelView):
-    column_list = ('id', 'user_id', 'people_id', 'planet_id')
-    form_columns = ('user_id', 'people_id', 'planet_id')
+    column_list = ('id', 'user_id', 'people_id', 'planet_id', 'vehicle_id')
+    form_columns = ('user_id', 'people_id', 'planet_id', 'vehicle_id')
+
+    # Mantiene favorites_count al día; corre antes del commit del admin
+    def on_model_change(self, form, model, is_created):
+        # primero todas las historias: el UPDATE dispara un autoflush que las borra
+        state = inspect(model)
+        changes = [(kind, state.attrs[attr].history) for kind, (resource_model, attr) in FAVORITE_TYPES.items()]
+        for kind, history in changes:
+            adjust_favorite_counts(db.session, kind, history.deleted, -1)
+            adjust_favorite_counts(db.session, kind, history.added, 1)
+
+    def on_model_delete(self, model):
+        for kind, (resource_model, attr) in FAVORITE_TYPES.items():
+            adjust_favorite_counts(db.session, kind, [getattr(model, attr)], -1)
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -17,4 +32,5 @@ def setup_admin(app):
     admin.add_view(ModelView(Users, db.session))
     admin.add_view(ModelView(People, db.session))
     admin.add_view(ModelView(Planets, db.session))
+    admin.add_view(ModelView(Vehicles, db.session))
     admin.add_view(FavoriteView(Favorites, db.session))
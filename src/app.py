@@ -1,213 +1,302 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
+
+create_app(role) builds the Flask app. APP_ROLE picks the role when the app
+is created without one (FLASK_APP=src/app.py, wsgi.py):
+
+    admin  (default) everything: the API, the Flask-Admin UI at /admin,
+           Flask-Migrate (flask db ...) and the other CLI commands.
+    api    only what serves requests. Flask-Admin, Flask-Migrate/Alembic and
+           the importer are never imported, so a new gunicorn worker starts
+           serving sooner. Run the admin UI and migrations from an admin
+           process (benchmarks/startup.py measures the difference).
+
+The extensions are module singletons (db, cache, jwt...), so build one app per
+process.
 """
 import os
-from flask import Flask, request, jsonify, url_for
-from flask_migrate import Migrate
+from datetime import datetime
+from flask import Flask, current_app, request, jsonify, url_for
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, Users, People, Planets, Favorites
-from sqlalchemy import select
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required, JWTManager
+from cache import cache
+from favorites import FAVORITE_TYPES, parse_bulk_items, bulk_add, bulk_remove, adjust_favorite_counts, rollup_favorite_counts
+from resources import register_resources, cached_models, catalog_models
+from catalog import catalog
+from pool import engine_options, pool_stats
+from replicas import replica_router
+from compression import compressor
+from ratelimit import rate_limiter
+from passwords import hash_password, verify_password, needs_rehash
+from search import parse_search_args, search
+from instrumentation import request_metrics
+from metrics import init_metrics, metrics_response
+from logs import setup_logging, get_logger
+from json_provider import FastJSONProvider
+import click
+from models import db, Users, Favorites
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from flask_jwt_extended import create_access_token, jwt_required
+from auth import init_jwt, user_claims, current_user_id, current_user_claims
 #from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-setup_admin(app)
+ROLES = ("api", "admin")
+logger = get_logger()
+
+
+def create_app(role=None):
+    role = role or os.getenv("APP_ROLE", "admin")
+    if role not in ROLES:
+        raise RuntimeError("APP_ROLE no válido: " + role)
+
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    # orjson si está instalado; si no, el json de la librería estándar
+    app.json = FastJSONProvider(app)
+
+    # Logs en JSON por una cola (ver logs.py): LOG_LEVEL y LOG_SAMPLE_RATES
+    app.config['LOG_LEVEL'] = os.getenv("LOG_LEVEL", "INFO")
+    app.config['LOG_SAMPLE_RATES'] = os.getenv("LOG_SAMPLE_RATES")
+    setup_logging(app)
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Métricas por petición (Server-Timing + log); avisa si se pasan de PERF_QUERY_THRESHOLD consultas
+    app.config['PERF_INSTRUMENTATION'] = os.getenv("PERF_INSTRUMENTATION", "1") == "1"
+    app.config['PERF_QUERY_THRESHOLD'] = int(os.getenv("PERF_QUERY_THRESHOLD", 20))
+    # Pool de conexiones: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT,
+    # DB_POOL_PRE_PING y DB_STATEMENT_TIMEOUT_MS, con valores por defecto según el motor
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    # Cache de /people/<id> y /planets/<id>: memory (por worker), shared o none
+    app.config['CACHE_BACKEND'] = os.getenv("CACHE_BACKEND", "memory")
+    app.config['CACHE_URL'] = os.getenv("CACHE_URL")
+    app.config['CACHE_TTL'] = int(os.getenv("CACHE_TTL", 300))
+    app.config['CACHE_MAXSIZE'] = int(os.getenv("CACHE_MAXSIZE", 1024))
+
+    # people, planets y vehicles en memoria, sin consultas por petición (ver catalog.py)
+    app.config['CATALOG_MODE'] = os.getenv("CATALOG_MODE", "0") == "1"
+    app.config['CATALOG_CHECK_SECONDS'] = float(os.getenv("CATALOG_CHECK_SECONDS", 1))
+
+    # Réplicas de lectura opcionales (ver replicas.py)
+    app.config['DATABASE_REPLICA_URLS'] = os.getenv("DATABASE_REPLICA_URLS")
+    app.config['DATABASE_REPLICA_STRATEGY'] = os.getenv("DATABASE_REPLICA_STRATEGY", "round_robin")
+    app.config['DATABASE_REPLICA_STICKY_SECONDS'] = int(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 5))
+    app.config['DATABASE_REPLICA_RETRY_SECONDS'] = int(os.getenv("DATABASE_REPLICA_RETRY_SECONDS", 30))
+
+    # Compresión según Accept-Encoding (ver compression.py): zstd y br si están instalados, gzip siempre
+    app.config['COMPRESS_ALGORITHMS'] = os.getenv("COMPRESS_ALGORITHMS", "zstd,br,gzip")
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    app.config['COMPRESS_BROTLI_LEVEL'] = int(os.getenv("COMPRESS_BROTLI_LEVEL", 5))
+    app.config['COMPRESS_ZSTD_LEVEL'] = int(os.getenv("COMPRESS_ZSTD_LEVEL", 3))
+    app.config['COMPRESS_CACHE_SIZE'] = int(os.getenv("COMPRESS_CACHE_SIZE", 256))
+
+    # Límites por cliente y ruta, y tope de peticiones simultáneas por worker (ver ratelimit.py)
+    app.config['RATELIMIT_RATES'] = os.getenv("RATELIMIT_RATES")
+    app.config['RATELIMIT_STORAGE'] = os.getenv("RATELIMIT_STORAGE", "memory")
+    app.config['RATELIMIT_URL'] = os.getenv("RATELIMIT_URL")
+    app.config['RATELIMIT_MAX_KEYS'] = int(os.getenv("RATELIMIT_MAX_KEYS", 10000))
+    app.config['RATELIMIT_MAX_CONCURRENT'] = int(os.getenv("RATELIMIT_MAX_CONCURRENT", 0))
+    app.config['RATELIMIT_QUEUE_MS'] = int(os.getenv("RATELIMIT_QUEUE_MS", 0))
+    app.config['RATELIMIT_EXEMPT'] = os.getenv("RATELIMIT_EXEMPT", "get_metrics,sitemap")
+
+    # Cantidad de proxies delante (Render: 1); remote_addr y el esquema salen de X-Forwarded-*
+    app.config['PROXY_FIX_X_FOR'] = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=app.config['PROXY_FIX_X_FOR'])
+
+    db.init_app(app)
+    with app.app_context():
+        pool_stats.init_engine(db.engine)
+    # antes que el resto: una petición rechazada no llega a tocar la base
+    rate_limiter.init_app(app)
+    replica_router.init_app(app, db.session)
+    CORS(app)
+    cache.init_app(app, models=cached_models())
+    catalog.init_app(app, db.session, models=catalog_models())
+    request_metrics.init_app(app)
+    compressor.init_app(app)
+
+    # JWT (ver auth.py): JWT_SECRET_KEY para HS256, o JWT_ALGORITHM=RS256/ES256 con
+    # las claves en JWT_KEYS_DIR (una por kid) y JWT_SIGNING_KID para firmar
+    app.config["JWT_ALGORITHM"] = os.getenv("JWT_ALGORITHM", "HS256")
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
+    app.config["JWT_KEYS_DIR"] = os.getenv("JWT_KEYS_DIR")
+    app.config["JWT_SIGNING_KID"] = os.getenv("JWT_SIGNING_KID")
+    app.config["JWT_TOKEN_CACHE_SIZE"] = int(os.getenv("JWT_TOKEN_CACHE_SIZE", 1024))
+    jwt = init_jwt(app)
+    with app.app_context():
+        init_metrics(app, db.engine, jwt)
+
+    register_routes(app)
+    if role == "admin":
+        setup_admin_role(app)
+    return app
+
+
+def setup_admin_role(app):
+    # Flask-Admin y Alembic tardan en importarse y no atienden la API: solo en el rol admin
+    from flask_migrate import Migrate
+    from admin import setup_admin
+    Migrate(app, db)
+    setup_admin(app)
+    register_commands(app)
 
-# Setup the Flask-JWT-Extended extension
-app.config["JWT_SECRET_KEY"] = "super-secret"  # Change this!
-jwt = JWTManager(app)
 
-# Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
-@app.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
-@app.route('/users', methods=['GET'])
-def get_all_users():
-    all_users = db.session.execute(select(Users)).scalars().all()
-    results = [user.serialize() for user in all_users]
-    
+def get_metrics():
+    return metrics_response()
 
-    response_body = {
-        "msg": "ok",
-        "results": results
-    }
+def get_pool_metrics():
+    stats = pool_stats.snapshot()
+    if replica_router.replicas:
+        stats["replicas"] = replica_router.snapshot()
+    return jsonify(stats), 200
 
-    return jsonify(response_body), 200 
+def get_catalog_metrics():
+    return jsonify(catalog.snapshot()), 200
 
-@app.route('/planets', methods=['GET'])
-def get_all_planets():
-    all_planets = db.session.execute(select(Planets)).scalars().all()
-    results = [planet.serialize() for planet in all_planets]
-    
+def search_catalog():
+    q, types, limit = parse_search_args(request.args)
 
     response_body = {
         "msg": "ok",
-        "results" : results
+        "results": search(db.session, q, types, limit)
     }
     return jsonify(response_body), 200 
 
-@app.route('/people', methods=['GET'])
-def get_all_people():
-    all_person = db.session.execute(select(People)).scalars().all()
-    results = [person.serialize() for person in all_person]
-    
-
-    response_body = {
-        "msg": "ok",
-        "results": results
-    }
-    return jsonify(response_body), 200 
+FAVORITE_RULE = '/favorite/<any(' + ", ".join(FAVORITE_TYPES) + '):kind>/<int:resource_id>'
 
-@app.route('/people/<int:id>', methods=['GET'])
-def get_one_people(id):
-    print(id)
-
-    Person = db.session.get(People, id)
-
-    if Person is None:
-        return jsonify({"msg": "el personaje no existe"}) , 404
-
-    response_body = {
-        "msg": "ok",
-        "result": Person.serialize()
-    }
-    return jsonify(response_body), 200 
+@jwt_required()
+def create_one_favorite(kind, resource_id):
+    user_id = current_user_id()
+    logger.debug("create favorite %s_id=%s user_id=%s", kind, resource_id, user_id)
 
-@app.route('/planets/<int:id>', methods=['GET'])
-def get_one_planet(id):
-    print(id)
-   
-    planet = db.session.get(Planets, id)
+    # como bulk_add: 404 si falta el usuario o el recurso, en lugar de un error de FK (o nada en SQLite)
+    if db.session.get(Users, user_id) is None:
+        return jsonify({"msg": "User not exist"}), 404
+    resource_model, column_name = FAVORITE_TYPES[kind]
+    if db.session.get(resource_model, resource_id) is None:
+        return jsonify({"msg": "el recurso no existe"}), 404
 
-    if planet is None:
-        return jsonify({"msg": "el planeta no existe"}) , 404
+    n_favorites = Favorites(user_id = user_id)
+    setattr(n_favorites, column_name, resource_id)
+    db.session.add(n_favorites)
+    try:
+        adjust_favorite_counts(db.session, kind, [resource_id], 1)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        # solo el índice único uq_favorites_user_<tipo> es un 409; cualquier otra violación sigue siendo un error
+        exists = db.session.execute(
+            select(Favorites.id).where(Favorites.user_id == user_id, getattr(Favorites, column_name) == resource_id)
+        ).first()
+        if exists is None:
+            raise
+        return jsonify({"msg": "el favorito ya existe"}), 409
 
     response_body = {
-        "msg": "ok",
-        "result": planet.serialize()
+         "msg": "ok",
     }
     return jsonify(response_body), 200 
 
-@app.route('/favorite/planet/<int:planet_id>', methods=['POST'])
-def create_one_favorite_planet(planet_id):
-    print(planet_id)
-    request_body = request.json
-    print(request_body) 
 
-    n_favorites = Favorites(user_id = request_body["user_id"], people_id = None, planet_id = planet_id )
-    db.session.add(n_favorites)
-    db.session.commit()
+@jwt_required()
+def delete_one_favorite(kind, resource_id):
+    user_id = current_user_id()
+    logger.debug("delete favorite %s_id=%s user_id=%s", kind, resource_id, user_id)
 
-    # if planet is None:
-    #     return jsonify({"msg": "el planeta no existe"}) , 404
+    # Borra el favorito de ese usuario con ese recurso (usa uq_favorites_user_<tipo>)
+    column = getattr(Favorites, FAVORITE_TYPES[kind][1])
+    deleted = db.session.execute(
+        delete(Favorites).where(Favorites.user_id == user_id, column == resource_id)
+    ).rowcount
 
-    response_body = {
-         "msg": "ok",
-        #"result": planet.serialize()
-    }
-    return jsonify(response_body), 200 
+    # Si no existe, devolvemos error 404
+    if deleted == 0:
+        db.session.rollback()
+        return jsonify({"msg": "favorito no encontrado"}), 404
 
-@app.route('/favorite/people/<int:people_id>', methods=['POST'])
-def create_one_favorite_people(people_id):
-    print(people_id)
-    request_body = request.json
-    print(request_body) 
+    adjust_favorite_counts(db.session, kind, [resource_id], -deleted)
 
-    n_favorites = Favorites(user_id = request_body["user_id"], people_id = people_id, planet_id = None )
-    db.session.add(n_favorites)
     db.session.commit()
 
     response_body = {
-         "msg": "ok",
-        
+        "msg": "favorito eliminado"
     }
-    return jsonify(response_body), 200 
-
+    return jsonify(response_body), 200
 
-@app.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
-def delete_onefavorite_planet(planet_id):
-    print(planet_id)
+@jwt_required()
+def create_bulk_favorites():
+    user_id = current_user_id()
+    items = parse_bulk_items(request.get_json(silent=True))
 
-    # Busca el favorito que tenga ese planet_id
-    fav_planet = db.session.execute(
-        select(Favorites).where(Favorites.planet_id == planet_id)
-    ).scalar_one_or_none()
+    if db.session.get(Users, user_id) is None:
+        return jsonify({"msg": "User not exist"}), 404
 
-    # Si no existe, devolvemos error 404
-    if fav_planet is None:
-        return jsonify({"msg": "favorito no encontrado"}), 404
+    created, results = bulk_add(db.session, user_id, items)
 
-    # Si existe, lo eliminamos
-    db.session.delete(fav_planet)
-    db.session.commit()
- 
     response_body = {
-        "msg": "favorito eliminado"
+        "msg": "ok",
+        "created": created,
+        "results": results
     }
     return jsonify(response_body), 200
 
-@app.route('/favorite/people/<int:people_id>', methods=['DELETE'])
-def delete_onefavorite_people(people_id):
-    print(people_id)
-
-    # Busca el favorito que tenga ese people_id
-    fav_people = db.session.execute(
-        select(Favorites).where(Favorites.people_id == people_id)
-    ).scalar_one_or_none()
+@jwt_required()
+def delete_bulk_favorites():
+    user_id = current_user_id()
+    items = parse_bulk_items(request.get_json(silent=True))
 
-    # Si no existe, devolvemos error 404
-    if fav_people is None:
-        return jsonify({"msg": "favorito no encontrado"}), 404
-
-    # Si existe, lo eliminamos
-    db.session.delete(fav_people)
-    db.session.commit()
+    deleted, results = bulk_remove(db.session, user_id, items)
 
     response_body = {
-        "msg": "favorito eliminado"
+        "msg": "ok",
+        "deleted": deleted,
+        "results": results
     }
     return jsonify(response_body), 200
 
 
 # Create a route to authenticate your users and return JWTs. The
 # create_access_token() function is used to actually generate the JWT.
-@app.route("/login", methods=["POST"])
 def login():
     email = request.json.get("email", None)
     password = request.json.get("password", None)
 
+    if not email or not password:
+        return jsonify({"msg": "Email and password are required"}), 400
+
     query_user= db.session.execute(select(Users).where(Users.email == email)).scalar_one_or_none()
 
     if query_user is None:
         return jsonify({"msg": "User not exist"}), 404
     
-    if email != query_user.email or password != query_user.password:
+    if not verify_password(query_user.password, password):
         return jsonify({"msg": "Bad username or password"}),401
 
-    access_token = create_access_token(identity=email)
+    # Si el hash es de otro método/costo (o texto plano), lo actualizamos
+    if needs_rehash(query_user.password):
+        query_user.password = hash_password(password)
+        db.session.commit()
+
+    # el id y los datos del usuario van en el token: las rutas protegidas no consultan users
+    access_token = create_access_token(identity=str(query_user.id), additional_claims=user_claims(query_user))
     return jsonify(access_token=access_token), 200 
 
-@app.route("/signup", methods=["POST"])
 def signup():
     email = request.json.get("email", None)
     password = request.json.get("password", None)
@@ -225,7 +314,7 @@ def signup():
         return jsonify({"msg": "User already exists"}), 409
 
     # Crear nuevo usuario
-    new_user = Users(email=email, password=password)
+    new_user = Users(email=email, password=hash_password(password), subscription_date=datetime.now())
     db.session.add(new_user)
     db.session.commit()
 
@@ -234,23 +323,81 @@ def signup():
 
 # Protect a route with jwt_required, which will kick out requests
 # without a valid JWT present.
-@app.route("/favorites", methods=["GET"])
 @jwt_required()
 def protected():
-    # Access the identity of the current user with get_jwt_identity
-    current_user = get_jwt_identity()
-    print(current_user)
+    # El usuario sale de los claims del token; solo se consultan sus favoritos
+    current_user = current_user_claims()
+    logger.debug("favorites for %s", current_user["id"])
+
+    favorites = db.session.execute(
+        select(Favorites).where(Favorites.user_id == current_user["id"]).options(*Favorites.name_loaders())
+    ).scalars()
 
-    query_user= db.session.execute(select(Users).where(Users.email == current_user)).scalar_one_or_none()
+    response_body = {
+        "msg": "ok",
+        "logged_in_as": current_user["email"],
+        "result": dict(current_user, favorites=[fav.serialize() for fav in favorites])
+    }
+    return jsonify(response_body), 200
 
-    user_favorites = db.session.execute(select(Favorites).where(Favorites.user_id == query_user.id)).scalar_one_or_none()
-    print(query_user)
-    print(user_favorites)
 
-    return jsonify(logged_in_as=current_user), 200
+def register_routes(app):
+    # Handle/serialize errors like a JSON object
+    app.register_error_handler(APIException, handle_invalid_usage)
+    app.add_url_rule('/', view_func=sitemap)
+    app.add_url_rule('/metrics', view_func=get_metrics, methods=['GET'])
+    app.add_url_rule('/metrics/pool', view_func=get_pool_metrics, methods=['GET'])
+    app.add_url_rule('/metrics/catalog', view_func=get_catalog_metrics, methods=['GET'])
+    # /people, /planets, /vehicles y /users con sus /<id> y /top (ver resources.py)
+    register_resources(app, db.session)
+    app.add_url_rule('/search', view_func=search_catalog, methods=['GET'])
+    app.add_url_rule(FAVORITE_RULE, view_func=create_one_favorite, methods=['POST'])
+    app.add_url_rule(FAVORITE_RULE, view_func=delete_one_favorite, methods=['DELETE'])
+    app.add_url_rule('/favorites/bulk', view_func=create_bulk_favorites, methods=['POST'])
+    app.add_url_rule('/favorites/bulk', view_func=delete_bulk_favorites, methods=['DELETE'])
+    app.add_url_rule("/login", view_func=login, methods=["POST"])
+    app.add_url_rule("/signup", view_func=signup, methods=["POST"])
+    app.add_url_rule("/favorites", view_func=protected, methods=["GET"])
+
+
+def register_commands(app):
+    from importer import IMPORTABLE, import_file
+
+    # Recalcula los contadores de favoritos (pensado para correr periódicamente)
+    @app.cli.command("rollup-favorites")
+    def rollup_favorites_command():
+        rollup_favorite_counts(db.session)
+        click.echo("favorites_count actualizado")
+
+    @app.cli.command("import-catalog")
+    @click.argument("resource", type=click.Choice(sorted(IMPORTABLE)))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", type=int, help="filas por transacción (por defecto según la base de datos)")
+    def import_catalog_command(resource, path, batch_size):
+        """Importa people, planets o vehicles desde un CSV, JSON o JSONL (upsert por id)."""
+        def progress(total, elapsed):
+            click.echo("\r%d filas, %.0f filas/s" % (total, total / elapsed if elapsed else 0), nl=False)
+
+        try:
+            total = import_file(db.session, IMPORTABLE[resource], path, batch_size, progress)
+        except ValueError as e:
+            db.session.rollback()
+            raise click.ClickException(str(e))
+        except IntegrityError as e:
+            db.session.rollback()
+            raise click.ClickException(str(e.orig))
+        click.echo("\n" + resource + ": " + str(total) + " filas importadas")
+
+
+def __getattr__(name):
+    # `from app import app` y FLASK_APP=src/app.py arman la app recién cuando la piden
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
 
 
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
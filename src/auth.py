@@ -0,0 +1,158 @@
+"""
+JWT setup: signing keys, the claims put in every access token and a cache of
+already verified tokens.
+
+Tokens carry the user id as identity plus the email and names, so protected
+routes read who is calling from the token instead of querying users. Claims
+are a snapshot taken at login and stay as they were until the token expires.
+
+JWT_ALGORITHM         HS256 (default) or an asymmetric one (RS256, ES256,
+                      EdDSA...). Asymmetric algorithms need the cryptography
+                      package.
+JWT_SECRET_KEY        shared secret for HS* algorithms. Required outside debug
+                      mode: every gunicorn worker has to verify the tokens the
+                      others signed.
+JWT_KEYS_DIR          for asymmetric algorithms: one PEM file per key, named
+                      <kid>.pem. Private keys sign and verify; public-only
+                      keys (an old key after a rotation) only verify. Every
+                      file is parsed once at startup.
+JWT_SIGNING_KID       kid of the key that signs new tokens (default: the
+                      last private key by name).
+JWT_TOKEN_CACHE_SIZE  verified tokens kept per worker (default 1024, 0 turns
+                      the cache off).
+
+To rotate: add the new <kid>.pem, point JWT_SIGNING_KID at it and keep the
+old file until the tokens it signed have expired.
+"""
+import os
+import secrets
+import time
+from flask_jwt_extended import JWTManager, get_jwt, get_jwt_identity
+from flask_jwt_extended.config import config
+from jwt.exceptions import InvalidTokenError
+from cache import MemoryBackend
+from logs import get_logger
+
+logger = get_logger("auth")
+
+# copia de cada token verificado como mucho este tiempo, aunque expire después
+TOKEN_CACHE_TTL = 300
+
+
+def load_keys(keys_dir):
+    """{kid: (private key or None, public key)} from the PEM files in keys_dir."""
+    try:
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+    except ImportError:
+        raise RuntimeError("JWT_ALGORITHM asimétrico necesita el paquete cryptography (pipenv install cryptography)")
+
+    keys = {}
+    for filename in sorted(os.listdir(keys_dir)):
+        if not filename.endswith(".pem"):
+            continue
+        with open(os.path.join(keys_dir, filename), "rb") as f:
+            pem = f.read()
+        kid = filename[:-len(".pem")]
+        if b"PRIVATE KEY" in pem:
+            private = load_pem_private_key(pem, password=None)
+            keys[kid] = (private, private.public_key())
+        else:
+            keys[kid] = (None, load_pem_public_key(pem))
+    return keys
+
+
+def user_claims(user):
+    """Claims extra del access token; lo que las rutas protegidas necesitan del usuario."""
+    return {"email": user.email, "first_name": user.first_name, "last_name": user.last_name}
+
+
+def current_user_id():
+    # el sub viaja como string (PyJWT lo exige); es el id del usuario
+    return int(get_jwt_identity())
+
+
+def current_user_claims():
+    claims = get_jwt()
+    return {"id": current_user_id(), "email": claims["email"],
+            "first_name": claims["first_name"], "last_name": claims["last_name"]}
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that remembers verified tokens, so a repeated token skips the
+    base64/JSON decoding and the signature check.
+
+    The key is the whole encoded token, signature included: any change to it
+    is a miss. Hits are still checked against exp.
+    """
+
+    def __init__(self, app=None, *args, **kwargs):
+        self.token_cache = None
+        super().__init__(app, *args, **kwargs)
+
+    def init_app(self, app, *args, **kwargs):
+        super().init_app(app, *args, **kwargs)
+        size = int(app.config.get("JWT_TOKEN_CACHE_SIZE", 1024))
+        self.token_cache = MemoryBackend(maxsize=size, ttl=TOKEN_CACHE_TTL) if size > 0 else None
+
+    # _decode_jwt_from_config es privado: todos los caminos de decode_token y
+    # verify_jwt_in_request pasan por él en flask-jwt-extended 4.7. La versión
+    # está fijada en el Pipfile; al subirla hay que revisar esta firma.
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if self.token_cache is None or csrf_value is not None:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        data = self.token_cache.get(encoded_token)
+        if data is not None and (allow_expired or data.get("exp", float("inf")) + config.leeway > time.time()):
+            return dict(data)
+
+        # fallo o token vencido: la verificación completa da el error correcto
+        data = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        self.token_cache.set(encoded_token, data)
+        return dict(data)
+
+
+def _setup_keys(app, jwt):
+    algorithm = app.config["JWT_ALGORITHM"]
+
+    if algorithm.startswith("HS"):
+        if not app.config.get("JWT_SECRET_KEY"):
+            if not (app.debug or app.testing):
+                raise RuntimeError("JWT_SECRET_KEY no está configurada; es obligatoria fuera de modo debug")
+            # solo para desarrollo: los tokens no sobreviven a un reinicio ni
+            # sirven entre workers de gunicorn
+            logger.warning("JWT_SECRET_KEY no está configurada; se usa una clave aleatoria por proceso")
+            app.config["JWT_SECRET_KEY"] = secrets.token_hex(32)
+        return
+
+    keys_dir = app.config.get("JWT_KEYS_DIR")
+    if not keys_dir:
+        raise RuntimeError("JWT_ALGORITHM=" + algorithm + " necesita JWT_KEYS_DIR")
+    keys = load_keys(keys_dir)
+    signing = [kid for kid, (private, public) in keys.items() if private is not None]
+    signing_kid = app.config.get("JWT_SIGNING_KID") or (signing[-1] if signing else None)
+    if signing_kid not in signing:
+        raise RuntimeError("no hay clave privada para firmar en " + keys_dir + " (JWT_SIGNING_KID=" + str(signing_kid) + ")")
+    signing_key = keys[signing_kid][0]
+    public_keys = {kid: public for kid, (private, public) in keys.items()}
+
+    @jwt.encode_key_loader
+    def _signing_key(identity):
+        return signing_key
+
+    @jwt.additional_headers_loader
+    def _kid_header(identity):
+        return {"kid": signing_kid}
+
+    @jwt.decode_key_loader
+    def _verifying_key(jwt_header, jwt_data):
+        key = public_keys.get(jwt_header.get("kid"))
+        if key is None:
+            raise InvalidTokenError("kid desconocido")
+        return key
+
+
+def init_jwt(app):
+    app.config.setdefault("JWT_ALGORITHM", "HS256")
+    jwt = CachingJWTManager(app)
+    _setup_keys(app, jwt)
+    return jwt
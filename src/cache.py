@@ -0,0 +1,216 @@
+"""
+Read-through cache for the single-resource GETs (/people/<id>, /planets/<id>).
+
+Entries are keyed by table and id and hold the already serialized dict, so a
+hit skips both the SQL round trip and serialize(). Any commit that inserts,
+updates or deletes a cached model evicts its entry; this covers the API routes
+and the Flask-Admin ModelViews alike because both write through db.session.
+
+Eviction only reaches this worker's memory backend. Each entry also stores the
+table version it was loaded under (conditional.py), and a lookup with a newer
+version is a miss. A write made by another worker or process therefore never
+gets served under the ETag of the new version.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from metrics import CACHE_REQUESTS
+
+
+class MemoryBackend:
+    """In-process LRU with TTL. Each gunicorn worker keeps its own copy."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class LocalSharedClient:
+    """Stand-in for a Redis client (get / set(ex=) / delete) used in local development."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedBackend:
+    """Cache shared by every worker. LRU eviction is left to the server (maxmemory-policy allkeys-lru)."""
+
+    def __init__(self, client, ttl=300, prefix="starwars:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        self.client.flushdb()
+
+
+def build_backend(config):
+    backend = config.get("CACHE_BACKEND", "memory")
+    ttl = int(config.get("CACHE_TTL", 300))
+
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryBackend(maxsize=int(config.get("CACHE_MAXSIZE", 1024)), ttl=ttl)
+    if backend == "shared":
+        url = config.get("CACHE_URL")
+        if not url or url == "local":
+            return SharedBackend(LocalSharedClient(), ttl=ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=shared with CACHE_URL needs the redis package (pipenv install redis)")
+        return SharedBackend(redis.Redis.from_url(url), ttl=ttl)
+    raise RuntimeError("CACHE_BACKEND no válido: " + backend)
+
+
+def cache_key(model, id):
+    return model.__tablename__ + ":" + str(id)
+
+
+class ResourceCache:
+    """Read-through cache of serialized detail resources, keyed by table and id."""
+
+    def __init__(self, models=()):
+        self.models = tuple(models)
+        self.backend = None
+
+    def init_app(self, app, models=()):
+        self.models = tuple(models) or self.models
+        self.backend = build_backend(app.config)
+        app.extensions["resource_cache"] = self
+
+    @staticmethod
+    def load(session, model, id):
+        row = session.execute(select(*model.public_columns()).where(model.id == id)).first()
+        return None if row is None else model.row_to_dict(row)
+
+    def get(self, session, model, id, version=None):
+        """Devuelve el dict serializado o None si la fila no existe.
+
+        Con version, una entrada cargada bajo otra versión de la tabla cuenta como fallo.
+        """
+        if self.backend is None:
+            return self.load(session, model, id)
+
+        key = cache_key(model, id)
+        entry = self.backend.get(key)
+        if entry is not None and (version is None or entry[0] == version):
+            CACHE_REQUESTS.labels(model.__tablename__, "hit").inc()
+            return entry[1]
+
+        CACHE_REQUESTS.labels(model.__tablename__, "miss").inc()
+        value = self.load(session, model, id)
+        if value is None:
+            return None
+        # la versión se leyó antes que la fila: nunca queda marcada con una más nueva que sus datos
+        self.backend.set(key, [version, value])
+        return value
+
+    def invalidate(self, *keys):
+        if self.backend is not None and keys:
+            self.backend.delete(*keys)
+
+
+cache = ResourceCache()
+
+
+# Las claves a invalidar se juntan en cada flush y se borran recién después del
+# commit; así otra petición no puede volver a cachear el valor viejo en medio.
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_keys(session, flush_context):
+    if not cache.models:
+        return
+    invalidate_on_commit(session, [
+        cache_key(type(obj), obj.id)
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, cache.models) and obj.id is not None
+    ])
+
+
+def invalidate_on_commit(session, keys):
+    """Evicts keys once the session commits; for writes that skip the ORM (bulk imports)."""
+    session.info.setdefault("cache_invalidate", set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_committed_keys(session):
+    pending = session.info.pop("cache_invalidate", None)
+    if pending:
+        cache.invalidate(*pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_keys(session):
+    session.info.pop("cache_invalidate", None)
@@ -0,0 +1,249 @@
+"""
+Catalog mode: people, planets and vehicles served from an in-memory snapshot.
+
+These tables are small and rarely change. With CATALOG_MODE=1 each worker
+loads them once at startup into a compact Table per model:
+
+    ids        array('q') of the ids in order; keyset cursors are a bisect
+    columns    one list per public field, aligned with ids
+    row_json   the encoded JSON of every row
+    pages      the encoded body of every page of the default walk
+               (?after=<next> with the default limit)
+
+A list page or detail GET is then written from those bytes without a query or
+a serialize(). Requests with filters (?gender=...) or ?stream=1 still go to
+the database; ?fields and other limits are answered from the columns.
+
+Refreshing: the snapshot carries the table_versions row it was loaded with.
+At most every CATALOG_CHECK_SECONDS (default 1) one request per worker reads
+table_versions, which is the only query catalog mode makes, and reloads the
+tables whose version moved. The new Table replaces the old one in a single
+assignment; requests keep the snapshot they started with. A commit in this
+worker that touches a catalog model makes the next request check right away.
+If the check fails the worker keeps serving the snapshot it has. With read
+replicas the check and the reload run on the request's replica.
+
+The footprint of every Table (arrays, values, encoded rows and pages) is
+served at /metrics/catalog and as the catalog_bytes gauge.
+"""
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from flask import current_app, g, has_request_context
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from conditional import get_version
+from logs import get_logger
+from metrics import CATALOG_BYTES
+from models import TableVersion
+from utils import DEFAULT_PAGE_SIZE, RESERVED_ARGS, parse_page_args, parse_fields
+
+logger = get_logger("catalog")
+
+
+class Table:
+    """Snapshot of one table. Never modified after it is built."""
+
+    __slots__ = ("model", "version", "updated_at", "loaded_at", "ids", "columns", "row_json", "pages", "footprint")
+
+    def __init__(self, model, version, updated_at, rows, encode):
+        self.model = model
+        self.version = version
+        self.updated_at = updated_at
+        self.loaded_at = time.time()
+        keys = model.public_keys
+        self.ids = array("q", (row[0] for row in rows))
+        self.columns = {key: [row[index] for row in rows] for index, key in enumerate(keys)}
+        self.row_json = [encode(dict(zip(keys, row))) for row in rows]
+        self.pages = {}
+        after = 0
+        while after is not None:
+            self.pages[after], after = self._page_body(after, DEFAULT_PAGE_SIZE)
+        self.footprint = self._measure()
+
+    def _slice(self, after, limit):
+        start = bisect_right(self.ids, after)
+        end = min(start + limit, len(self.ids))
+        next_cursor = self.ids[end - 1] if end < len(self.ids) else None
+        return start, end, next_cursor
+
+    def _page_body(self, after, limit):
+        # mismo formato que jsonify con salida compacta: claves ordenadas, sin espacios
+        start, end, next_cursor = self._slice(after, limit)
+        body = (
+            b'{"msg":"ok","next":' + (b"null" if next_cursor is None else str(next_cursor).encode()) +
+            b',"results":[' + b",".join(self.row_json[start:end]) + b"]}"
+        )
+        return body, next_cursor
+
+    def page_body(self, after, limit):
+        if limit == DEFAULT_PAGE_SIZE and after in self.pages:
+            return self.pages[after]
+        return self._page_body(after, limit)[0]
+
+    def page(self, after, limit, keys):
+        start, end, next_cursor = self._slice(after, limit)
+        columns = [self.columns[key] for key in keys]
+        results = [dict(zip(keys, values)) for values in zip(*(column[start:end] for column in columns))]
+        return {"msg": "ok", "results": results, "next": next_cursor}
+
+    def position(self, id):
+        index = bisect_right(self.ids, id) - 1
+        return index if index >= 0 and self.ids[index] == id else None
+
+    def row(self, index):
+        return {key: column[index] for key, column in self.columns.items()}
+
+    def _measure(self):
+        # aproximado: sys.getsizeof de cada objeto; los valores compartidos entre filas se cuentan cada vez
+        columns = sum(sys.getsizeof(column) + sum(sys.getsizeof(value) for value in column) for column in self.columns.values())
+        rows = sys.getsizeof(self.row_json) + sum(sys.getsizeof(body) for body in self.row_json)
+        pages = sys.getsizeof(self.pages) + sum(sys.getsizeof(body) for body in self.pages.values())
+        return {"ids": sys.getsizeof(self.ids), "columns": columns, "row_json": rows, "pages": pages,
+                "total": sys.getsizeof(self.ids) + columns + rows + pages}
+
+
+class Catalog:
+    """Holds the current Table of every catalog model and refreshes them when their version moves."""
+
+    def __init__(self):
+        self.session = None
+        self.models = ()
+        self.check_seconds = 1.0
+        self._tables = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.models)
+
+    def init_app(self, app, session, models=()):
+        if not app.config.get("CATALOG_MODE"):
+            return
+        self.session = session
+        self.models = tuple(models)
+        self.check_seconds = float(app.config.get("CATALOG_CHECK_SECONDS", 1))
+        app.extensions["catalog"] = self
+        with app.app_context():
+            self.refresh()
+
+    def _compact(self):
+        # en modo debug jsonify indenta: ahí no sirven los bytes ya codificados
+        provider = current_app.json
+        return not (provider.compact is False or (provider.compact is None and current_app.debug))
+
+    def refresh(self):
+        """Reloads the tables whose version changed; returns the current {name: Table}."""
+        names = [model.__tablename__ for model in self.models]
+        try:
+            versions = {
+                row.name: (row.version, row.updated_at)
+                for row in self.session.execute(
+                    select(TableVersion.name, TableVersion.version, TableVersion.updated_at).where(TableVersion.name.in_(names))
+                )
+            }
+            tables = dict(self._tables)
+            for model in self.models:
+                version, updated_at = versions.get(model.__tablename__, (0, None))
+                current = tables.get(model.__tablename__)
+                if current is not None and current.version == version:
+                    continue
+                rows = self.session.execute(select(*model.public_columns()).order_by(model.id)).all()
+                tables[model.__tablename__] = table = Table(model, version, updated_at, rows, current_app.json.encode)
+                CATALOG_BYTES.labels(model.__tablename__).set(table.footprint["total"])
+                logger.info("catalog %s v%s: %d filas, %d bytes", model.__tablename__, version, len(rows), table.footprint["total"])
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            logger.warning("no se pudo refrescar el catálogo, sigue la copia anterior: %s", e)
+            return self._tables
+        # un solo reemplazo: quien ya tiene el dict viejo lo sigue usando entero
+        self._tables = tables
+        return tables
+
+    def _current(self):
+        now = time.monotonic()
+        if now >= self._next_check and self._lock.acquire(blocking=False):
+            # si otro thread ya está refrescando, esta petición usa la copia que hay
+            try:
+                self._next_check = now + self.check_seconds
+                return self.refresh()
+            finally:
+                self._lock.release()
+        return self._tables
+
+    def table(self, model):
+        """The snapshot of model for this request, or None to read from the database."""
+        if not self.enabled or model not in self.models:
+            return None
+        if not has_request_context():
+            return self._current().get(model.__tablename__)
+        # toda la petición (ETag y body) ve la misma copia
+        if "catalog_tables" not in g:
+            g.catalog_tables = self._current()
+        return g.catalog_tables.get(model.__tablename__)
+
+    def version(self, session, model):
+        table = self.table(model)
+        if table is None:
+            return get_version(session, model)
+        return table.version, table.updated_at
+
+    def list_response(self, model, args):
+        """Response for GET /<name>, or None when it has to go to the database."""
+        table = self.table(model)
+        if table is None or any(key not in RESERVED_ARGS for key in args):
+            return None
+        after, limit = parse_page_args(args)
+        if "fields" not in args and self._compact():
+            return current_app.response_class(table.page_body(after, limit), mimetype=current_app.json.mimetype)
+        return current_app.json.response(table.page(after, limit, parse_fields(model, args)))
+
+    def detail_response(self, model, id, not_found):
+        table = self.table(model)
+        if table is None:
+            return None
+        index = table.position(id)
+        if index is None:
+            response = current_app.json.response({"msg": not_found})
+            response.status_code = 404
+            return response
+        if self._compact():
+            body = b'{"msg":"ok","result":' + table.row_json[index] + b"}"
+            return current_app.response_class(body, mimetype=current_app.json.mimetype)
+        return current_app.json.response({"msg": "ok", "result": table.row(index)})
+
+    def expire(self):
+        self._next_check = 0.0
+
+    def snapshot(self):
+        return {
+            name: {"version": table.version, "rows": len(table.ids), "loaded_at": table.loaded_at, "bytes": table.footprint}
+            for name, table in self._tables.items()
+        }
+
+
+catalog = Catalog()
+
+
+# Un commit de este worker sobre un modelo del catálogo adelanta el próximo chequeo
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_writes(session, flush_context):
+    if catalog.models and any(
+        isinstance(obj, catalog.models) for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+    ):
+        session.info["catalog_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _expire_catalog(session):
+    if session.info.pop("catalog_dirty", False):
+        catalog.expire()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_catalog_writes(session):
+    session.info.pop("catalog_dirty", None)
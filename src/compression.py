@@ -0,0 +1,132 @@
+"""
+Response compression negotiated from Accept-Encoding: zstd, br or gzip.
+
+COMPRESS_ALGORITHMS   server preference, default "zstd,br,gzip". Codings
+                      whose package is not installed (zstandard, brotli) are
+                      dropped; gzip is always there. Empty turns it off.
+COMPRESS_MIN_SIZE     bodies smaller than this many bytes go out as they are
+                      (default 1024): below that the headers cost more than
+                      what is saved.
+COMPRESS_GZIP_LEVEL   1-9, default 6.
+COMPRESS_BROTLI_LEVEL 0-11, default 5.
+COMPRESS_ZSTD_LEVEL   1-22, default 3.
+COMPRESS_CACHE_SIZE   compressed bodies kept per worker for responses that
+                      have an ETag (default 256, 0 = off). They are keyed by
+                      a hash of the uncompressed body, so a repeated list page
+                      is compressed once and then only hashed.
+
+Streamed responses (?stream=1) are not compressed. A compressed response
+gets a weak ETag (W/"..."), since its bytes differ from the identity ones;
+conditional.py compares ETags weakly, so both still get their 304.
+"""
+import gzip
+import hashlib
+from flask import request
+from cache import MemoryBackend
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+
+def available_codings():
+    codings = ["gzip"]
+    if brotli is not None:
+        codings.append("br")
+    if zstandard is not None:
+        codings.append("zstd")
+    return codings
+
+
+class Compressor:
+    """Compresses eligible responses with the best coding the client accepts."""
+
+    def __init__(self):
+        self.codings = []
+        self.min_size = 1024
+        self.levels = {"gzip": 6, "br": 5, "zstd": 3}
+        self.cache = None
+
+    def init_app(self, app):
+        wanted = [name.strip() for name in app.config.get("COMPRESS_ALGORITHMS", "zstd,br,gzip").split(",") if name.strip()]
+        self.codings = [name for name in wanted if name in available_codings()]
+        self.min_size = int(app.config.get("COMPRESS_MIN_SIZE", 1024))
+        self.levels = {
+            "gzip": int(app.config.get("COMPRESS_GZIP_LEVEL", 6)),
+            "br": int(app.config.get("COMPRESS_BROTLI_LEVEL", 5)),
+            "zstd": int(app.config.get("COMPRESS_ZSTD_LEVEL", 3)),
+        }
+        size = int(app.config.get("COMPRESS_CACHE_SIZE", 256))
+        self.cache = MemoryBackend(maxsize=size, ttl=int(app.config.get("CACHE_TTL", 300))) if size > 0 else None
+        if not self.codings:
+            return
+        app.after_request(self._compress_response)
+        app.extensions["compressor"] = self
+
+    def compress(self, data, coding):
+        if coding == "gzip":
+            # mtime=0: el mismo body da siempre los mismos bytes
+            return gzip.compress(data, compresslevel=self.levels["gzip"], mtime=0)
+        if coding == "br":
+            return brotli.compress(data, quality=self.levels["br"])
+        if coding == "zstd":
+            return zstandard.compress(data, self.levels["zstd"])
+        raise ValueError("coding no soportado: " + coding)
+
+    def _cached_compress(self, data, coding):
+        if self.cache is None:
+            return self.compress(data, coding)
+        key = coding + ":" + hashlib.blake2b(data, digest_size=16).hexdigest()
+        body = self.cache.get(key)
+        if body is None:
+            body = self.compress(data, coding)
+            self.cache.set(key, body)
+        return body
+
+    @staticmethod
+    def _compressible(response):
+        mimetype = response.mimetype or ""
+        return (
+            (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+            and not response.direct_passthrough
+            and not response.is_streamed
+            and "Content-Encoding" not in response.headers
+        )
+
+    def _compress_response(self, response):
+        if response.status_code == 304:
+            # el cliente validó con la ETag débil de la versión comprimida: se la devolvemos igual
+            etag, weak = response.get_etag()
+            if etag and not weak and request.if_none_match.is_weak(etag):
+                response.set_etag(etag, weak=True)
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206) or not self._compressible(response):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        coding = request.accept_encodings.best_match(self.codings)
+        if coding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        cacheable = "ETag" in response.headers
+        body = self._cached_compress(data, coding) if cacheable else self.compress(data, coding)
+        response.set_data(body)
+        response.headers["Content-Encoding"] = coding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = Compressor()
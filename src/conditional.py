@@ -0,0 +1,111 @@
+"""
+ETag / Last-Modified support for the catalog GETs.
+
+Every commit that touches a versioned table bumps its row in table_versions
+inside the same transaction. A conditional GET only reads that one row, so a
+matching If-None-Match / If-Modified-Since gets its 304 before the route runs
+its select() or serializes anything.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import g, has_request_context, request, make_response, Response
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+from models import TableVersion
+
+versioned_tables = set()
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_versions(session, flush_context):
+    tables = {
+        obj.__tablename__
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if getattr(obj, "__tablename__", None) in versioned_tables
+    }
+    if not tables:
+        return
+    connection = session.connection()
+    now = utcnow()
+    for name in sorted(tables):
+        bump_version(connection, name, now)
+
+
+def bump_version(connection, name, now=None):
+    """Bumps one table's version; for writes that skip the ORM (bulk imports)."""
+    now = now or utcnow()
+    bumped = connection.execute(
+        update(TableVersion)
+        .where(TableVersion.name == name)
+        .values(version=TableVersion.version + 1, updated_at=now)
+    )
+    if bumped.rowcount == 0:
+        connection.execute(insert(TableVersion).values(name=name, version=1, updated_at=now))
+
+
+def get_version(session, model):
+    row = session.execute(
+        select(TableVersion.version, TableVersion.updated_at).where(TableVersion.name == model.__tablename__)
+    ).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def request_version(model):
+    """The version conditional_get read for model in this request, or None."""
+    if not has_request_context():
+        return None
+    return g.get("table_versions", {}).get(model.__tablename__)
+
+
+def make_etag(model, version):
+    # la misma versión da respuestas distintas según la ruta, la query y el formato
+    variant = request.full_path + "|" + str(request.accept_mimetypes.best)
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:16]
+    return model.__tablename__ + "-" + str(version) + "-" + digest
+
+
+def conditional_get(session, model, version=None):
+    """Decorator: answers 304 when the client already has the current version.
+
+    version() returns (version, updated_at); by default it reads table_versions.
+    """
+    versioned_tables.add(model.__tablename__)
+    read_version = version or (lambda: get_version(session, model))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, updated_at = read_version()
+            # la vista usa la misma versión que la ETag (ver cache.get)
+            g.setdefault("table_versions", {})[model.__tablename__] = version
+            etag = make_etag(model, version)
+            last_modified = updated_at.replace(tzinfo=timezone.utc, microsecond=0) if updated_at else None
+
+            not_modified = False
+            if request.if_none_match:
+                # comparación débil: la versión comprimida lleva W/"..." (compression.py)
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified is not None:
+                not_modified = last_modified <= request.if_modified_since
+
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.vary.add("Accept")
+            return response
+        return wrapper
+    return decorator
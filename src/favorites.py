@@ -0,0 +1,171 @@
+"""
+Bulk add / remove of favorites and the favorites_count counters behind the
+/people/top, /planets/top and /vehicles/top leaderboards.
+
+Each bulk call validates every item with one query per resource type, writes
+all rows with a single executemany and commits once. Every write path adjusts
+favorites_count in the same transaction; rollup_favorite_counts() recomputes
+the counters from scratch if they ever drift.
+"""
+from sqlalchemy import select, insert, delete, update, func
+from utils import APIException
+from models import People, Planets, Vehicles, Favorites
+
+MAX_BULK_ITEMS = 10000
+
+# tipo en el JSON -> (modelo, columna en favorites)
+FAVORITE_TYPES = {
+    "people": (People, "people_id"),
+    "planet": (Planets, "planet_id"),
+    "vehicle": (Vehicles, "vehicle_id"),
+}
+
+
+MAX_TOP = 100
+
+
+def adjust_favorite_counts(session, kind, ids, delta):
+    """Suma delta al contador de cada id (un UPDATE por llamada)."""
+    ids = [resource_id for resource_id in ids if resource_id is not None]
+    if not ids:
+        return
+    model = FAVORITE_TYPES[kind][0]
+    session.execute(
+        update(model)
+        .where(model.id.in_(ids))
+        .values(favorites_count=model.favorites_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rollup_favorite_counts(session):
+    """Recalcula todos los contadores desde la tabla favorites."""
+    for kind, (model, column_name) in FAVORITE_TYPES.items():
+        column = getattr(Favorites, column_name)
+        counted = select(func.count(Favorites.id)).where(column == model.id).scalar_subquery()
+        session.execute(update(model).values(favorites_count=counted).execution_options(synchronize_session=False))
+    session.commit()
+
+
+def top_resources(session, model, args):
+    try:
+        n = int(args.get("n", 20))
+    except ValueError:
+        raise APIException("n debe ser entero", status_code=400)
+    n = max(1, min(n, MAX_TOP))
+    # recorre ix_<tabla>_favorites_count hacia atrás: solo lee n filas
+    keys = model.public_keys + ("favorites_count",)
+    stmt = (
+        select(*model.public_columns(), model.favorites_count)
+        .order_by(model.favorites_count.desc(), model.id.desc())
+        .limit(n)
+    )
+    return [dict(zip(keys, row)) for row in session.execute(stmt)]
+
+
+def parse_bulk_items(request_body):
+    if not isinstance(request_body, dict):
+        raise APIException("El body debe ser un objeto JSON", status_code=400)
+    # el usuario sale del token (current_user_id), nunca del body
+    items = request_body.get("items")
+    if not isinstance(items, list) or not items:
+        raise APIException("items debe ser una lista no vacía", status_code=400)
+    if len(items) > MAX_BULK_ITEMS:
+        raise APIException("Máximo " + str(MAX_BULK_ITEMS) + " items por petición", status_code=400)
+    return items
+
+
+def _classify(session, user_id, items):
+    """Devuelve [(index, type, resource_id, status)] y los favoritos actuales {(type, id): fav_id}."""
+    wanted = {name: set() for name in FAVORITE_TYPES}
+    for item in items:
+        if isinstance(item, dict) and item.get("type") in FAVORITE_TYPES and isinstance(item.get("resource_id"), int):
+            wanted[item["type"]].add(item["resource_id"])
+
+    # una consulta por tipo para saber qué recursos existen
+    existing_resources = {}
+    for name, ids in wanted.items():
+        model = FAVORITE_TYPES[name][0]
+        existing_resources[name] = set(session.execute(select(model.id).where(model.id.in_(ids))).scalars()) if ids else set()
+
+    # y una para los favoritos que el usuario ya tiene
+    kinds = list(FAVORITE_TYPES)
+    columns = [getattr(Favorites, column_name) for model, column_name in FAVORITE_TYPES.values()]
+    current = {}
+    for fav_id, *resource_ids in session.execute(
+        select(Favorites.id, *columns).where(Favorites.user_id == user_id)
+    ):
+        for kind, resource_id in zip(kinds, resource_ids):
+            if resource_id is not None:
+                current.setdefault((kind, resource_id), fav_id)
+                break
+
+    classified = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get("type") not in FAVORITE_TYPES or not isinstance(item.get("resource_id"), int):
+            classified.append((index, None, None, "invalid"))
+            continue
+        kind, resource_id = item["type"], item["resource_id"]
+        if resource_id not in existing_resources[kind]:
+            classified.append((index, kind, resource_id, "not_found"))
+        else:
+            classified.append((index, kind, resource_id, "ok"))
+    return classified, current
+
+
+def _result(index, kind, resource_id, status):
+    return {"index": index, "type": kind, "resource_id": resource_id, "status": status}
+
+
+def bulk_add(session, user_id, items):
+    classified, current = _classify(session, user_id, items)
+
+    rows = []
+    seen = set()
+    results = []
+    for index, kind, resource_id, status in classified:
+        key = (kind, resource_id)
+        if status == "ok" and key in current:
+            status = "exists"
+        elif status == "ok" and key in seen:
+            status = "duplicate"
+        elif status == "ok":
+            seen.add(key)
+            row = dict.fromkeys(column_name for model, column_name in FAVORITE_TYPES.values())
+            row.update({"user_id": user_id, FAVORITE_TYPES[kind][1]: resource_id})
+            rows.append(row)
+            status = "created"
+        results.append(_result(index, kind, resource_id, status))
+
+    if rows:
+        # executemany en una sola transacción
+        session.execute(insert(Favorites), rows)
+        for kind in FAVORITE_TYPES:
+            adjust_favorite_counts(session, kind, [resource_id for k, resource_id in seen if k == kind], 1)
+    session.commit()
+    return len(rows), results
+
+
+def bulk_remove(session, user_id, items):
+    classified, current = _classify(session, user_id, items)
+
+    to_delete = {name: set() for name in FAVORITE_TYPES}
+    results = []
+    for index, kind, resource_id, status in classified:
+        if status != "invalid":
+            if resource_id in to_delete[kind]:
+                status = "duplicate"
+            elif (kind, resource_id) in current:
+                to_delete[kind].add(resource_id)
+                status = "deleted"
+            else:
+                status = "not_found"
+        results.append(_result(index, kind, resource_id, status))
+
+    for kind, ids in to_delete.items():
+        if ids:
+            column = getattr(Favorites, FAVORITE_TYPES[kind][1])
+            session.execute(delete(Favorites).where(Favorites.user_id == user_id, column.in_(ids)))
+            adjust_favorite_counts(session, kind, ids, -1)
+    session.commit()
+    return sum(len(ids) for ids in to_delete.values()), results
@@ -0,0 +1,200 @@
+"""
+Bulk import of the reference catalog (people, planets, vehicles) from JSON or
+CSV files, used by `flask import-catalog`.
+
+Rows are matched on id and upserted, so importing the same file twice leaves
+the table as it was; rows whose values did not change are not rewritten. Each
+batch is one transaction:
+
+    postgresql  COPY into a temporary table, then one INSERT ... SELECT
+                ON CONFLICT (id) DO UPDATE.
+    sqlite      executemany of INSERT ... ON CONFLICT (id) DO UPDATE.
+    mysql       executemany of INSERT ... ON DUPLICATE KEY UPDATE.
+
+Every batch that inserts or changes rows also bumps the table version (ETags)
+and evicts the cached resources it touched, like a commit through the ORM
+would; a batch where nothing changed leaves both alone.
+"""
+import csv
+import io
+import json
+import os
+import time
+from sqlalchemy import column, or_, select, table, text
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from cache import cache_key, invalidate_on_commit
+from conditional import bump_version
+from models import People, Planets, Vehicles
+
+IMPORTABLE = {"people": People, "planets": Planets, "vehicles": Vehicles}
+
+# filas por transacción: COPY aguanta lotes grandes; en SQLite y MySQL el
+# executemany se parte en sentencias de varios VALUES y más no mejora
+BATCH_SIZES = {"postgresql": 50000, "sqlite": 5000, "mysql": 2000}
+DEFAULT_BATCH_SIZE = 2000
+
+
+def read_rows(path):
+    """Yields dicts from a .csv, a .json list (or {"results": [...]}) or a .jsonl file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif extension == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("results")
+        if not isinstance(data, list):
+            raise ValueError(path + ": se esperaba una lista de objetos o {\"results\": [...]}")
+        yield from data
+    elif extension in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        raise ValueError(path + ": formato no soportado (csv, json o jsonl)")
+
+
+def _coerce(value, python_type):
+    if value is None or value == "":
+        return None
+    if python_type is int:
+        # SWAPI trae "unknown", "n/a" o "1,358" en los campos numéricos
+        try:
+            return int(str(value).replace(",", ""))
+        except ValueError:
+            return None
+    return str(value)
+
+
+def import_fields(model, first):
+    """(key en el archivo, columna, tipo) de las columnas que trae el archivo; el resto no se toca."""
+    return [
+        (key, model.public_fields[key], getattr(model, model.public_fields[key]).type.python_type)
+        for key in model.public_keys if key in first
+    ]
+
+
+def prepare_row(fields, raw, line):
+    if not isinstance(raw, dict):
+        raise ValueError("fila " + str(line) + ": se esperaba un objeto")
+    row = {name: _coerce(raw.get(key), python_type) for key, name, python_type in fields}
+    if row["id"] is None:
+        raise ValueError("fila " + str(line) + ": falta el id")
+    return row
+
+
+def _upsert_statement(dialect, model, names):
+    target = model.__table__
+    updated = [name for name in names if name != "id"]
+    if dialect == "sqlite":
+        stmt = sqlite.insert(target)
+        if not updated:
+            return stmt.on_conflict_do_nothing(index_elements=["id"])
+        return stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={name: stmt.excluded[name] for name in updated},
+            where=or_(*[target.c[name].is_distinct_from(stmt.excluded[name]) for name in updated]),
+        )
+    if dialect == "mysql":
+        stmt = mysql.insert(target)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in (updated or ["id"])})
+    raise ValueError("import-catalog no soporta " + dialect)
+
+
+def _copy_batch(connection, model, names, rows):
+    """COPY rows into a temporary table and upsert from there in one statement."""
+    target = model.__table__
+    staging_name = "import_" + target.name
+    connection.execute(text(
+        "CREATE TEMPORARY TABLE " + staging_name + " (LIKE " + target.name + " INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+
+    # QUOTE_NONNUMERIC escribe None como "" entre comillas, que COPY lee como
+    # texto vacío: FORCE_NULL lo vuelve NULL en las columnas que lo aceptan
+    # (_coerce ya convirtió los "" del archivo en None)
+    nullable = [name for name in names if target.c[name].nullable]
+    options = "FORMAT csv" + (", FORCE_NULL (" + ", ".join(nullable) + ")" if nullable else "")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row[name] for name in names])
+    buffer.seek(0)
+    with connection.connection.driver_connection.cursor() as cursor:
+        cursor.copy_expert(
+            "COPY " + staging_name + " (" + ", ".join(names) + ") FROM STDIN WITH (" + options + ")", buffer
+        )
+
+    staging = table(staging_name, *[column(name) for name in names])
+    updated = [name for name in names if name != "id"]
+    stmt = postgresql.insert(target).from_select(names, select(*staging.c))
+    if updated:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={name: stmt.excluded[name] for name in updated},
+            where=or_(*[target.c[name].is_distinct_from(stmt.excluded[name]) for name in updated]),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["id"])
+    return connection.execute(stmt).rowcount
+
+
+def _write_batch(session, dialect, model, names, rows):
+    connection = session.connection()
+    if dialect == "postgresql":
+        changed = _copy_batch(connection, model, names, rows)
+    else:
+        changed = connection.execute(_upsert_statement(dialect, model, names), rows).rowcount
+    # rowcount cuenta solo las filas insertadas o cambiadas (el WHERE del upsert
+    # salta las iguales); un lote sin cambios no invalida ETags ni el catálogo
+    if changed:
+        bump_version(connection, model.__tablename__)
+        invalidate_on_commit(session, [cache_key(model, row["id"]) for row in rows])
+    session.commit()
+
+
+def _reset_sequence(session, model):
+    # los ids vienen del archivo; sin esto el próximo INSERT de la API choca
+    name = model.__tablename__
+    session.execute(text(
+        "SELECT setval(pg_get_serial_sequence(:name, 'id'), (SELECT max(id) FROM " + name + "))"
+    ), {"name": name})
+    session.commit()
+
+
+def import_file(session, model, path, batch_size=None, progress=None):
+    """Upserts every row of path into model's table. Returns the number of rows read."""
+    dialect = session.get_bind().dialect.name
+    batch_size = batch_size or BATCH_SIZES.get(dialect, DEFAULT_BATCH_SIZE)
+
+    rows = iter(read_rows(path))
+    first = next(rows, None)
+    if first is None:
+        return 0
+    if not isinstance(first, dict) or "id" not in first:
+        raise ValueError(path + ": la primera fila no tiene id")
+    fields = import_fields(model, first)
+    names = [name for key, name, python_type in fields]
+
+    start = time.perf_counter()
+    total = 0
+    batch = [prepare_row(fields, first, 1)]
+    for line, raw in enumerate(rows, start=2):
+        batch.append(prepare_row(fields, raw, line))
+        if len(batch) >= batch_size:
+            _write_batch(session, dialect, model, names, batch)
+            total += len(batch)
+            batch = []
+            if progress:
+                progress(total, time.perf_counter() - start)
+    if batch:
+        _write_batch(session, dialect, model, names, batch)
+        total += len(batch)
+        if progress:
+            progress(total, time.perf_counter() - start)
+
+    if dialect == "postgresql":
+        _reset_sequence(session, model)
+    return total
@@ -0,0 +1,110 @@
+"""
+Per-request performance numbers: SQL query count, DB time, JSON encoding time
+and response size.
+
+They are sent back in a Server-Timing header (visible in the browser devtools)
+and written as one JSON log line per request on the "starwars.perf" logger.
+Requests that run more than PERF_QUERY_THRESHOLD queries are logged as
+warnings, which is how N+1 patterns show up. The cost per query is two
+perf_counter() calls, cheap enough to keep on in production.
+
+Streamed responses (?stream=1) send their headers before the rows are read,
+so only the work done before the first byte is counted for them and their
+size is left out.
+"""
+import logging
+import time
+from flask import g, has_request_context, request, request_started, request_finished
+from json_provider import FastJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("starwars.perf")  # sale por la cola de logs.py
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get("perf")
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that adds the time spent encoding to the request metrics."""
+
+    def encode(self, obj, indent=False):
+        perf = _current()
+        if perf is None:
+            return super().encode(obj, indent)
+        start = time.perf_counter()
+        try:
+            return super().encode(obj, indent)
+        finally:
+            perf["serialize"] += time.perf_counter() - start
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    perf = _current()
+    if perf is not None:
+        perf["query_start"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    perf = _current()
+    if perf is not None and perf["query_start"] is not None:
+        perf["queries"] += 1
+        perf["db"] += time.perf_counter() - perf["query_start"]
+        perf["query_start"] = None
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.query_threshold = 20
+        self.enabled = True
+
+    def init_app(self, app):
+        self.enabled = app.config.get("PERF_INSTRUMENTATION", True)
+        self.query_threshold = int(app.config.get("PERF_QUERY_THRESHOLD", 20))
+        if not self.enabled:
+            return
+        app.json = TimedJSONProvider(app)
+        request_started.connect(self._started, app)
+        request_finished.connect(self._finished, app)
+
+    def _started(self, sender, **extra):
+        g.perf = {"start": time.perf_counter(), "queries": 0, "db": 0.0, "serialize": 0.0, "query_start": None}
+
+    def _finished(self, sender, response, **extra):
+        perf = _current()
+        if perf is None:
+            return
+        total = time.perf_counter() - perf["start"]
+        size = None if response.is_streamed else response.calculate_content_length()
+
+        timing = 'db;dur=%.2f;desc="%d queries", serialize;dur=%.2f, total;dur=%.2f' % (
+            perf["db"] * 1000, perf["queries"], perf["serialize"] * 1000, total * 1000
+        )
+        if size is not None:
+            # tamaño que sale por la red: ya pasó por la compresión
+            timing += ', size;desc="%d"' % size
+        response.headers.add("Server-Timing", timing)
+
+        too_many = perf["queries"] > self.query_threshold
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "queries": perf["queries"],
+            "db_ms": round(perf["db"] * 1000, 2),
+            "serialize_ms": round(perf["serialize"] * 1000, 2),
+            "total_ms": round(total * 1000, 2),
+            "bytes": size,
+            "too_many_queries": too_many,
+        }
+        logger.log(logging.WARNING if too_many else logging.INFO, "request", extra={"fields": line})
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,45 @@
+"""
+JSON provider for the Flask app: orjson when it is installed, the standard
+library otherwise. Output matches Flask's default provider (sorted keys,
+indented in debug mode); responses are built straight from the encoded bytes.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+
+    def encode(self, obj, indent=False):
+        """Encodes obj to UTF-8 bytes."""
+        if orjson is None:
+            kwargs = {"indent": 2} if indent else {"separators": (",", ":")}
+            return super().dumps(obj, **kwargs).encode("utf-8")
+        # las fechas pasan por self.default para salir igual que con Flask (http_date)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = self.encode(obj, indent=indent)
+        if indent:
+            body += b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
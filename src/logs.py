@@ -0,0 +1,130 @@
+"""
+Logging for the API: leveled, sampled per route and written off the request
+thread.
+
+Request code only formats the message and puts the record on a bounded queue;
+a QueueListener thread turns it into a JSON line and writes it to stdout. If
+the queue is full the record is dropped (and counted) instead of blocking.
+
+LOG_LEVEL         minimum level for the "starwars" loggers (default INFO).
+LOG_SAMPLE_RATES  fraction of DEBUG/INFO records kept per endpoint, e.g.
+                  "get_one_people=0.01,get_all_people=0.1,default=1".
+                  WARNING and above are never sampled out.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from flask import has_request_context, request
+
+LOGGER_NAME = "starwars"
+QUEUE_SIZE = 10000
+
+
+def get_logger(name=None):
+    return logging.getLogger(LOGGER_NAME if name is None else LOGGER_NAME + "." + name)
+
+
+def parse_sample_rates(raw):
+    rates = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        endpoint, rate = part.split("=", 1)
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of DEBUG/INFO records per endpoint and tags them with it."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self.default = rates.get("default", 1.0)
+
+    def filter(self, record):
+        endpoint = request.endpoint if has_request_context() else None
+        record.endpoint = endpoint
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(endpoint, self.default)
+        return rate >= 1 or random.random() < rate
+
+
+class JSONFormatter(logging.Formatter):
+
+    def format(self, record):
+        line = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "endpoint": getattr(record, "endpoint", None),
+            "msg": record.getMessage(),
+        }
+        # campos estructurados pasados con extra={"fields": {...}}
+        line.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            line["exc"] = record.exc_text
+        return json.dumps(line)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the request: when the queue is full the record is lost."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Solo se resuelve el mensaje aquí (los args pueden ser objetos de la
+        # petición); el JSON se arma en el thread del listener
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+_listener = None
+
+
+def _start_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+    _listener.start()
+
+
+def setup_logging(app):
+    logger = get_logger()
+    if any(isinstance(h, DroppingQueueHandler) for h in logger.handlers):
+        return logger
+
+    level = app.config.get("LOG_LEVEL", "INFO")
+    rates = parse_sample_rates(app.config.get("LOG_SAMPLE_RATES"))
+
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(rates))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JSONFormatter())
+
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _start_listener(log_queue, stream_handler)
+    # el thread del listener no sobrevive al fork de gunicorn --preload
+    os.register_at_fork(after_in_child=lambda: _start_listener(log_queue, stream_handler))
+    atexit.register(lambda: _listener.stop())
+    return logger
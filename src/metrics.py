@@ -0,0 +1,135 @@
+"""
+Prometheus metrics served at /metrics.
+
+With several gunicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory (gunicorn.conf.py wipes it on start): every worker writes its
+samples there and whichever worker answers /metrics adds them all up. Without
+it, /metrics only shows the worker that served the scrape. gunicorn.conf.py
+sets a default directory, so a plain `gunicorn -c gunicorn.conf.py` already
+combines its workers.
+
+prometheus_client picks multiprocess mode when it is imported, so the
+directory is checked here first. A missing one is created; if that fails
+(`flask run`, `flask db upgrade` with a bad path) the process falls back to
+its own in-memory metrics instead of failing to import.
+"""
+import os
+import time
+
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _multiproc_dir:
+    try:
+        os.makedirs(_multiproc_dir, exist_ok=True)
+    except OSError:
+        del os.environ["PROMETHEUS_MULTIPROC_DIR"]
+from flask import g, request, request_started, request_finished, Response
+from flask_jwt_extended.default_callbacks import (
+    default_invalid_token_callback,
+    default_expired_token_callback,
+    default_unauthorized_callback,
+)
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+from sqlalchemy import event
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint",
+    ["method", "endpoint", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being served right now", multiprocess_mode="livesum"
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool", multiprocess_mode="livesum"
+)
+DB_POOL_SIZE = Gauge(
+    "db_pool_size", "Configured pool size per worker", multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections", "Connections opened beyond the pool size", multiprocess_mode="livesum"
+)
+CACHE_REQUESTS = Counter(
+    "resource_cache_requests", "Resource cache lookups", ["model", "result"]
+)
+CATALOG_BYTES = Gauge(
+    "catalog_bytes", "Memory held by the catalog snapshot of each table", ["table"], multiprocess_mode="livesum"
+)
+REQUESTS_REJECTED = Counter(
+    "http_requests_rejected", "Requests turned away by ratelimit.py", ["endpoint", "reason"]
+)
+JWT_VERIFICATIONS = Counter(
+    "jwt_verifications", "JWT checks on protected routes", ["result"]
+)
+
+
+def _started(sender, **extra):
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _finished(sender, response, **extra):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(
+        request.method, request.endpoint or "not_found", str(response.status_code)
+    ).observe(time.perf_counter() - start)
+
+
+def _watch_pool(engine):
+    pool = engine.pool
+    size = getattr(pool, "size", None)
+    if size is not None:
+        DB_POOL_SIZE.set(size())
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(*args):
+        DB_POOL_CHECKED_OUT.inc()
+        overflow = getattr(pool, "overflow", None)
+        if overflow is not None:
+            DB_POOL_OVERFLOW.set(max(overflow(), 0))
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(*args):
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def _watch_jwt(jwt):
+    @jwt.token_verification_loader
+    def _verified(jwt_header, jwt_data):
+        JWT_VERIFICATIONS.labels("ok").inc()
+        return True
+
+    @jwt.invalid_token_loader
+    def _invalid(error_string):
+        JWT_VERIFICATIONS.labels("invalid").inc()
+        return default_invalid_token_callback(error_string)
+
+    @jwt.expired_token_loader
+    def _expired(jwt_header, jwt_data):
+        JWT_VERIFICATIONS.labels("expired").inc()
+        return default_expired_token_callback(jwt_header, jwt_data)
+
+    @jwt.unauthorized_loader
+    def _missing(error_string):
+        JWT_VERIFICATIONS.labels("missing").inc()
+        return default_unauthorized_callback(error_string)
+
+
+def init_metrics(app, engine, jwt):
+    request_started.connect(_started, app)
+    request_finished.connect(_finished, app)
+    _watch_pool(engine)
+    _watch_jwt(jwt)
+
+
+def metrics_response():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -1,38 +1,69 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, DateTime, ForeignKey
+from sqlalchemy import String, Boolean, DateTime, ForeignKey, Index
 from datetime import datetime
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from operator import attrgetter
+from sqlalchemy.orm import relationship, Mapped, mapped_column, joinedload
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession manda las lecturas de los GET a las réplicas (ver replicas.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
-class People(db.Model):
+
+class Serializer:
+    """serialize() generado una sola vez por modelo a partir de public_fields.
+
+    Las rutas de lectura no necesitan objetos ORM: seleccionan public_columns()
+    y convierten cada Row con row_to_dict().
+    """
+    public_fields = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.public_fields:
+            cls.public_keys = tuple(cls.public_fields)
+            cls._public_getter = attrgetter(*cls.public_fields.values())
+
+    def serialize(self):
+        return dict(zip(self.public_keys, self._public_getter(self)))
+
+    @classmethod
+    def public_columns(cls, keys=None):
+        return [getattr(cls, cls.public_fields[key]) for key in (keys or cls.public_keys)]
+
+    @classmethod
+    def row_to_dict(cls, row, keys=None):
+        return dict(zip(keys or cls.public_keys, row))
+
+
+class People(Serializer, db.Model):
     __tablename__ = "people"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
-    height: Mapped[int] = mapped_column(nullable=True)
+    height: Mapped[int] = mapped_column(nullable=True, index=True)
     eye_color: Mapped[str] = mapped_column(String(50))
-    gender: Mapped[str] = mapped_column(String(50))
+    gender: Mapped[str] = mapped_column(String(50), index=True)
 
     # Relación inversa con Favorites
     favorites: Mapped[list["Favorites"]] = relationship("Favorites", back_populates="people")
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "height": self.height,
-            "eye_color": self.eye_color,
-            "gender": self.gender
-        } 
-    
-class Users(db.Model):
+    # Contador desnormalizado de favoritos (ver favorites.adjust_favorite_counts)
+    favorites_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+    # Campos públicos: clave en el JSON -> columna del modelo
+    public_fields = {"id": "id", "name": "name", "height": "height", "eye_color": "eye_color", "gender": "gender"}
+
+    __table_args__ = (Index("ix_people_favorites_count", "favorites_count", "id"),)
+
+
+class Users(Serializer, db.Model):
     __tablename__ = "users"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     first_name: Mapped[str] = mapped_column(String(50), nullable=True)
     last_name: Mapped[str] = mapped_column(String(50), nullable=True)
     email: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
-    password: Mapped[str] = mapped_column(String(80), nullable=False)
+    # hash de werkzeug (ver passwords.py); los scrypt ocupan ~162 caracteres
+    password: Mapped[str] = mapped_column(String(255), nullable=False)
     subscription_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
 
     favorites: Mapped[list["Favorites"]] = relationship(
@@ -41,60 +72,44 @@ class Users(db.Model):
         cascade="all, delete-orphan"
     )
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.first_name,
-            "email": self.email
-        }
-
-    def all_user_favorites(self):
-        results_favorites = [fav.serialize() for fav in self.favorites]
-        return {
-            "id": self.id,
-            "first_name": self.first_name,
-            "last_name": self.last_name,
-            "email": self.email,
-            "favorites": results_favorites
-        }
+    # Nunca exponemos el password
+    public_fields = {"id": "id", "name": "first_name", "email": "email"}
 
     
-class Planets(db.Model):
+class Planets(Serializer, db.Model):
     __tablename__ = "planets"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
-    climate: Mapped[str] = mapped_column(String(50))
+    climate: Mapped[str] = mapped_column(String(50), index=True)
     gravity: Mapped[str] = mapped_column(String(50))
     terrain: Mapped[str] = mapped_column(String(50))
 
     # Relación inversa con Favorites
     favorites: Mapped[list["Favorites"]] = relationship("Favorites", back_populates="planet")
-    
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "climate": self.climate,
-            "gravity": self.gravity,
-            "terrain": self.terrain
-        }        
-
-class Vehicles(db.Model):
+
+    favorites_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+    public_fields = {"id": "id", "name": "name", "climate": "climate", "gravity": "gravity", "terrain": "terrain"}
+
+    __table_args__ = (Index("ix_planets_favorites_count", "favorites_count", "id"),)
+
+
+class Vehicles(Serializer, db.Model):
     __tablename__ = "vehicles"
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(120), nullable=False)
     model: Mapped[str] = mapped_column(String(50))
     crew: Mapped[str] = mapped_column(String(50))
     passengers: Mapped[str] = mapped_column(String(50))
-    
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "model": self.model,
-            "crew": self.crew,
-            "passengers": self.passengers
-        }    
+
+    favorites: Mapped[list["Favorites"]] = relationship("Favorites", back_populates="vehicle")
+
+    favorites_count: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+
+    public_fields = {"id": "id", "name": "name", "model": "model", "crew": "crew", "passengers": "passengers"}
+
+    __table_args__ = (Index("ix_vehicles_favorites_count", "favorites_count", "id"),)
+
 
 class Favorites(db.Model):
     __tablename__ = "favorites"
@@ -102,10 +117,35 @@ class Favorites(db.Model):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     people_id: Mapped[int | None] = mapped_column(ForeignKey("people.id"), nullable=True)
     planet_id: Mapped[int | None] = mapped_column(ForeignKey("planets.id"), nullable=True)
+    vehicle_id: Mapped[int | None] = mapped_column(ForeignKey("vehicles.id"), nullable=True)
 
     user: Mapped["Users"] = relationship("Users", back_populates="favorites")
     people: Mapped["People"] = relationship("People", back_populates="favorites")
     planet: Mapped["Planets"] = relationship("Planets", back_populates="favorites")
+    vehicle: Mapped["Vehicles"] = relationship("Vehicles", back_populates="favorites")
+
+    # Un usuario no puede repetir un favorito; los índices también sirven para
+    # las búsquedas por (user_id, recurso) de los DELETE y de /favorites
+    __table_args__ = (
+        Index("uq_favorites_user_people", "user_id", "people_id", unique=True,
+              postgresql_where=people_id.isnot(None), sqlite_where=people_id.isnot(None)),
+        Index("uq_favorites_user_planet", "user_id", "planet_id", unique=True,
+              postgresql_where=planet_id.isnot(None), sqlite_where=planet_id.isnot(None)),
+        Index("uq_favorites_user_vehicle", "user_id", "vehicle_id", unique=True,
+              postgresql_where=vehicle_id.isnot(None), sqlite_where=vehicle_id.isnot(None)),
+        Index("ix_favorites_people_id", "people_id"),
+        Index("ix_favorites_planet_id", "planet_id"),
+        Index("ix_favorites_vehicle_id", "vehicle_id"),
+    )
+
+    @staticmethod
+    def name_loaders():
+        """Trae por JOIN solo el nombre de cada recurso que usa serialize()."""
+        return (
+            joinedload(Favorites.people).load_only(People.name),
+            joinedload(Favorites.planet).load_only(Planets.name),
+            joinedload(Favorites.vehicle).load_only(Vehicles.name),
+        )
 
     def serialize(self):
         result = {
@@ -122,9 +162,22 @@ class Favorites(db.Model):
             result["type"] = "planet"
             result["name"] = self.planet.name
 
+        elif self.vehicle_id and self.vehicle:
+            result["resource_id"] = self.vehicle_id
+            result["type"] = "vehicle"
+            result["name"] = self.vehicle.name
+
         return result
 
 
+class TableVersion(db.Model):
+    """Contador de cambios por tabla; lo usan los ETag / Last-Modified."""
+    __tablename__ = "table_versions"
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
 # Para el diagrama ER
 # from eralchemy2 import render_er
 
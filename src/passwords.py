@@ -0,0 +1,76 @@
+"""
+Password hashing for /signup and /login.
+
+Hashes use werkzeug.security (already installed with Flask). The method and its
+cost come from PASSWORD_HASH_METHOD, e.g. "scrypt:32768:8:1" or
+"pbkdf2:sha256:600000"; short names like "scrypt" get werkzeug's defaults. A login whose stored hash used other parameters, or a
+row still holding a plaintext password, is rehashed with the current ones.
+
+Hashing is the most CPU-expensive step of /login, so it runs on a small bounded
+pool of native threads (PASSWORD_HASH_WORKERS): a burst of logins queues there
+instead of occupying every worker thread or, under gevent, the event loop.
+"""
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+HASH_PREFIXES = ("scrypt:", "pbkdf2:")
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        try:
+            from gevent import monkey
+            patched = monkey.is_module_patched("threading")
+        except ImportError:
+            patched = False
+        if patched:
+            # con gevent los threads de concurrent.futures serían greenlets y
+            # el hash bloquearía el loop; usamos el pool de threads reales de gevent
+            from gevent.threadpool import ThreadPool
+            _pool = ThreadPool(HASH_WORKERS)
+        else:
+            _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+    return _pool
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if isinstance(pool, ThreadPoolExecutor):
+        return pool.submit(fn, *args).result()
+    return pool.apply(fn, args)
+
+
+def is_hashed(stored):
+    return stored.startswith(HASH_PREFIXES) and "$" in stored
+
+
+def hash_password(password, method=None):
+    return _run(generate_password_hash, password, method or HASH_METHOD)
+
+
+@lru_cache(maxsize=8)
+def method_prefix(method):
+    """The prefix werkzeug writes for method, with its defaults filled in
+    ("scrypt" -> "scrypt:32768:8:1"). Costs one hash, once per method."""
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(stored, method=None):
+    if not is_hashed(stored):
+        return True
+    return stored.split("$", 1)[0] != method_prefix(method or HASH_METHOD)
+
+
+def verify_password(stored, password):
+    if not is_hashed(stored):
+        # filas anteriores al hashing: comparación en tiempo constante
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    return _run(check_password_hash, stored, password)
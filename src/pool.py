@@ -0,0 +1,115 @@
+"""
+SQLAlchemy engine / connection pool settings read from the environment.
+
+Every gunicorn worker opens its own pool, so size it with:
+    workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) <= max_connections of the database
+"""
+import os
+import threading
+from sqlalchemy import event
+
+# Valores por defecto por motor; cualquier variable de entorno los pisa
+BACKEND_DEFAULTS = {
+    "postgresql": {"pool_size": 5, "max_overflow": 10, "pool_recycle": 1800, "pool_timeout": 30, "pool_pre_ping": True, "statement_timeout_ms": 30000},
+    # MySQL corta conexiones inactivas (wait_timeout), reciclamos antes
+    "mysql": {"pool_size": 5, "max_overflow": 10, "pool_recycle": 280, "pool_timeout": 30, "pool_pre_ping": True, "statement_timeout_ms": 30000},
+    # SQLite es un archivo local: no hace falta pre-ping ni reciclar
+    "sqlite": {"pool_size": 5, "max_overflow": 10, "pool_recycle": -1, "pool_timeout": 30, "pool_pre_ping": False, "statement_timeout_ms": 0},
+}
+
+ENV_VARS = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_recycle": "DB_POOL_RECYCLE",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "statement_timeout_ms": "DB_STATEMENT_TIMEOUT_MS",
+}
+
+
+def backend_name(db_url):
+    scheme = db_url.split(":", 1)[0]
+    return scheme.split("+", 1)[0]
+
+
+def _read_env(environ, defaults):
+    settings = dict(defaults)
+    for key, var in ENV_VARS.items():
+        value = environ.get(var)
+        if value is None or value == "":
+            continue
+        if key == "pool_pre_ping":
+            settings[key] = value.lower() in ("1", "true", "yes")
+        else:
+            settings[key] = int(value)
+    return settings
+
+
+def engine_options(db_url, environ=os.environ):
+    """Arma SQLALCHEMY_ENGINE_OPTIONS para la URL dada."""
+    backend = backend_name(db_url)
+    settings = _read_env(environ, BACKEND_DEFAULTS.get(backend, BACKEND_DEFAULTS["postgresql"]))
+    timeout_ms = settings.pop("statement_timeout_ms")
+
+    options = dict(settings)
+    if backend == "sqlite" and ":memory:" in db_url:
+        # la base en memoria vive en una sola conexión
+        for key in ("pool_size", "max_overflow", "pool_timeout"):
+            options.pop(key)
+
+    connect_args = {}
+    if backend == "postgresql" and timeout_ms:
+        connect_args["options"] = "-c statement_timeout=" + str(timeout_ms)
+    elif backend == "mysql" and timeout_ms:
+        connect_args["init_command"] = "SET SESSION MAX_EXECUTION_TIME=" + str(timeout_ms)
+    elif backend == "sqlite":
+        # cuánto espera una escritura por el lock del archivo, en segundos
+        connect_args["timeout"] = int(environ.get("DB_SQLITE_BUSY_TIMEOUT", 15))
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+class PoolStats:
+    """Counts pool events for one engine; current usage comes from the pool itself."""
+
+    def __init__(self):
+        self.engine = None
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self._lock = threading.Lock()
+
+    def _incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def init_engine(self, engine):
+        self.engine = engine
+        event.listen(engine, "connect", lambda *args: self._incr("connects"))
+        event.listen(engine, "checkout", lambda *args: self._incr("checkouts"))
+        event.listen(engine, "invalidate", lambda *args: self._incr("invalidated"))
+
+    def snapshot(self):
+        pool = self.engine.pool
+        stats = {
+            "pool_class": type(pool).__name__,
+            "connects_total": self.connects,
+            "checkouts_total": self.checkouts,
+            "invalidated_total": self.invalidated,
+        }
+        # QueuePool expone el uso actual; otros pools (StaticPool, NullPool) no
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                stats[name] = method()
+        if "overflow" in stats:
+            # QueuePool cuenta en negativo mientras el pool no se llenó
+            stats["overflow"] = max(stats["overflow"], 0)
+        max_overflow = getattr(pool, "_max_overflow", None)
+        if max_overflow is not None:
+            stats["max_overflow"] = max_overflow
+        return stats
+
+
+pool_stats = PoolStats()
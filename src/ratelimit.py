@@ -0,0 +1,240 @@
+"""
+Admission control: a token bucket per client and route, plus a cap on the
+requests a worker serves at once.
+
+Clients are keyed by the JWT identity when the request carries a valid access
+token and by IP otherwise. Tokens are decoded through the same verified-token
+cache as the protected routes (auth.py), so this costs one dict lookup for a
+repeated token. Behind a proxy (Render, a load balancer) set PROXY_FIX_X_FOR
+(app.py) so the IP is the client's and not the proxy's.
+
+RATELIMIT_RATES            budgets per endpoint, e.g.
+                           "default=20/s,login=10/m,signup=10/m,get_all_people=5/s".
+                           "N/period" refills N tokens per period (s, m, h,
+                           or a number of seconds like 10s) and lets a client
+                           burst up to N. Endpoints without an entry share the
+                           "default" bucket; "none" turns the limit off for
+                           one endpoint. Empty = no per-client limits.
+RATELIMIT_STORAGE          memory (default, per worker) or shared.
+RATELIMIT_URL              Redis URL for shared; empty or "local" keeps the
+                           buckets in process, like CACHE_URL=local does.
+RATELIMIT_MAX_KEYS         buckets kept in memory per worker (default 10000).
+RATELIMIT_MAX_CONCURRENT   requests a worker runs at once; the rest get 503
+                           (default 0 = off). Only gevent workers run more
+                           than one request at a time; with them, around
+                           DB_POOL_SIZE + DB_MAX_OVERFLOW keeps requests from
+                           waiting on the pool. Requests that never touch the
+                           database (catalog mode, cache hits) count too, so
+                           leave room above the pool size.
+RATELIMIT_QUEUE_MS         how long a request may wait for a free slot before
+                           getting its 503 (default 0: shed right away).
+RATELIMIT_EXEMPT           endpoints never limited (default get_metrics,sitemap).
+
+A client over its budget gets 429 and one that arrives while the worker is
+full gets 503; both carry Retry-After. Shedding before the pool is exhausted
+keeps requests from queueing DB_POOL_TIMEOUT seconds for a connection.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import g, jsonify, request
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.config import config
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from metrics import REQUESTS_REJECTED
+
+PERIODS = {"s": 1, "m": 60, "h": 3600}
+
+# Redis no tiene el bucket: el script lo lee, lo rellena y lo descuenta en un paso atómico
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+def parse_rate(raw):
+    """"10/s" -> (10 tokens por segundo, burst 10); "none" -> None."""
+    raw = raw.strip()
+    if raw == "none":
+        return None
+    count, period = raw.split("/", 1)
+    period = period.strip()
+    if period[-1:] in PERIODS:
+        seconds = float(period[:-1] or 1) * PERIODS[period[-1]]
+    else:
+        seconds = float(period)
+    count = int(count)
+    if count <= 0 or seconds <= 0:
+        raise RuntimeError("límite no válido en RATELIMIT_RATES: " + raw)
+    return count / seconds, count
+
+
+def parse_rates(raw):
+    rates = {}
+    for part in (raw or "").split(","):
+        if "=" not in part:
+            continue
+        endpoint, rate = part.split("=", 1)
+        rates[endpoint.strip()] = parse_rate(rate)
+    return rates
+
+
+class MemoryBuckets:
+    """Token buckets in process, evicting the least recently used key. Each worker counts on its own."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Seconds to wait before the next token; 0 means the request may go."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - ts) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class SharedBuckets:
+    """Token buckets in Redis, shared by every worker."""
+
+    def __init__(self, client, prefix="starwars:ratelimit:"):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, rate, burst):
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+
+def build_buckets(config):
+    storage = config.get("RATELIMIT_STORAGE", "memory")
+    maxsize = int(config.get("RATELIMIT_MAX_KEYS", 10000))
+
+    if storage == "memory":
+        return MemoryBuckets(maxsize)
+    if storage == "shared":
+        url = config.get("RATELIMIT_URL")
+        if not url or url == "local":
+            return MemoryBuckets(maxsize)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE=shared with RATELIMIT_URL needs the redis package (pipenv install redis)")
+        return SharedBuckets(redis.Redis.from_url(url))
+    raise RuntimeError("RATELIMIT_STORAGE no válido: " + storage)
+
+
+def client_key():
+    """user:<jwt identity> with a valid token, ip:<address> otherwise."""
+    header = request.headers.get(config.header_name, "")
+    prefix = config.header_type + " " if config.header_type else ""
+    if header.startswith(prefix) and len(header) > len(prefix):
+        try:
+            data = decode_token(header[len(prefix):])
+            return "user:" + str(data[config.identity_claim_key])
+        except (JWTExtendedException, PyJWTError, KeyError):
+            # token inválido o vencido: la ruta lo va a rechazar; se limita por IP
+            pass
+    return "ip:" + str(request.remote_addr)
+
+
+def _reject(status, msg, retry_after):
+    response = jsonify({"msg": msg})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class RateLimiter:
+    """Admits or rejects each request by its client's token bucket and the worker's free slots."""
+
+    def __init__(self):
+        self.rates = {}
+        self.default = None
+        self.buckets = None
+        self.exempt = set()
+        self.slots = None
+        self.max_concurrent = 0
+        self.queue_seconds = 0.0
+
+    def init_app(self, app):
+        self.rates = parse_rates(app.config.get("RATELIMIT_RATES"))
+        self.default = self.rates.pop("default", None)
+        self.buckets = build_buckets(app.config) if self.rates or self.default else None
+        self.exempt = {
+            name.strip() for name in app.config.get("RATELIMIT_EXEMPT", "get_metrics,sitemap").split(",") if name.strip()
+        } | {"static"}
+
+        self.max_concurrent = int(app.config.get("RATELIMIT_MAX_CONCURRENT") or 0)
+        self.queue_seconds = int(app.config.get("RATELIMIT_QUEUE_MS", 0)) / 1000
+        self.slots = threading.BoundedSemaphore(self.max_concurrent) if self.max_concurrent > 0 else None
+
+        if self.buckets is None and self.slots is None:
+            return
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        app.extensions["rate_limiter"] = self
+
+    def _budget(self, endpoint):
+        if endpoint in self.rates:
+            return endpoint, self.rates[endpoint]
+        return "default", self.default
+
+    def _admit(self):
+        endpoint = request.endpoint
+        if endpoint in self.exempt:
+            return None
+
+        if self.buckets is not None:
+            bucket, rate = self._budget(endpoint)
+            if rate is not None:
+                wait = self.buckets.take(bucket + "|" + client_key(), *rate)
+                if wait > 0:
+                    REQUESTS_REJECTED.labels(endpoint or "not_found", "rate_limit").inc()
+                    return _reject(429, "demasiadas peticiones, probá de nuevo más tarde", wait)
+
+        if self.slots is not None:
+            if self.queue_seconds > 0:
+                acquired = self.slots.acquire(timeout=self.queue_seconds)
+            else:
+                acquired = self.slots.acquire(blocking=False)
+            if not acquired:
+                REQUESTS_REJECTED.labels(endpoint or "not_found", "overloaded").inc()
+                return _reject(503, "el servidor está ocupado, probá de nuevo en un momento", 1)
+            g.ratelimit_slot = True
+        return None
+
+    def _release(self, error=None):
+        # teardown corre siempre, también si la vista falló o la respuesta fue en streaming
+        if g.pop("ratelimit_slot", False):
+            self.slots.release()
+
+
+rate_limiter = RateLimiter()
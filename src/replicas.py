@@ -0,0 +1,201 @@
+"""
+Read replicas: GET requests read from a replica, everything else uses the
+primary (DATABASE_URL).
+
+DATABASE_REPLICA_URLS            comma separated replica URLs; empty = no
+                                 routing, every query goes to the primary.
+DATABASE_REPLICA_STRATEGY        round_robin (default) or least_connections
+                                 (fewest checked-out connections in this
+                                 worker's pools).
+DATABASE_REPLICA_STICKY_SECONDS  after a request that wrote, the client gets
+                                 a cookie that sends its reads to the primary
+                                 for this long, so it reads its own writes
+                                 while the replicas catch up (default 5).
+DATABASE_REPLICA_RETRY_SECONDS   a replica that fails to connect or drops a
+                                 connection is skipped this long; then one
+                                 SELECT 1 decides whether it is back (default 30).
+
+The replica is picked once per request, so every read of a request sees the
+same snapshot. Inside a GET, the first INSERT/UPDATE/DELETE or flush moves the
+rest of the request to the primary. CLI commands and migrations never see a
+request and always use the primary. A GET that finds its replica down is run
+again on the primary (reads are safe to repeat); later requests skip that
+replica.
+
+Cached resources (cache.py) are checked against the table version read on the
+request's replica, so they are as current as that replica.
+"""
+import itertools
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql.dml import UpdateBase
+from logs import get_logger
+from pool import engine_options
+
+logger = get_logger("replicas")
+
+STICKY_COOKIE = "db_primary_until"
+READ_METHODS = ("GET", "HEAD")
+
+
+class Replica:
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.down_until = 0.0
+
+    def checked_out(self):
+        checkedout = getattr(self.engine.pool, "checkedout", None)
+        return checkedout() if checkedout is not None else 0
+
+
+class ReplicaRouter:
+    """Picks the replica each read request uses; a client that just wrote stays on the primary."""
+
+    def __init__(self):
+        self.session = None
+        self.replicas = []
+        self.strategy = "round_robin"
+        self.sticky_seconds = 5
+        self.retry_seconds = 30
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, session):
+        self.session = session
+        urls = [url.strip() for url in (app.config.get("DATABASE_REPLICA_URLS") or "").split(",") if url.strip()]
+        self.strategy = app.config.get("DATABASE_REPLICA_STRATEGY", "round_robin")
+        if self.strategy not in ("round_robin", "least_connections"):
+            raise RuntimeError("DATABASE_REPLICA_STRATEGY no válida: " + self.strategy)
+        self.sticky_seconds = int(app.config.get("DATABASE_REPLICA_STICKY_SECONDS", 5))
+        self.retry_seconds = int(app.config.get("DATABASE_REPLICA_RETRY_SECONDS", 30))
+
+        self.replicas = []
+        for index, url in enumerate(urls):
+            url = url.replace("postgres://", "postgresql://")
+            replica = Replica("replica_" + str(index), create_engine(url, **engine_options(url)))
+            event.listen(replica.engine, "handle_error", self._error_handler(replica))
+            self.replicas.append(replica)
+        if not self.replicas:
+            return
+
+        app.before_request(self._pick)
+        app.after_request(self._stick)
+        app.register_error_handler(OperationalError, self._retry_on_primary)
+        event.listen(Session, "after_flush", _mark_write)
+        app.extensions["replica_router"] = self
+
+    def _error_handler(self, replica):
+        def handle_error(context):
+            # connection None: falló el connect; is_disconnect: se cayó una conexión abierta
+            if context.connection is None or context.is_disconnect:
+                self.mark_down(replica)
+                if has_request_context():
+                    g.db_replica_failed = True
+        return handle_error
+
+    def mark_down(self, replica):
+        if replica.down_until < time.monotonic():
+            logger.warning("replica %s no responde; se saltea %ss", replica.name, self.retry_seconds)
+        replica.down_until = time.monotonic() + self.retry_seconds
+
+    def _is_up(self, replica):
+        if replica.down_until == 0.0:
+            return True
+        if replica.down_until > time.monotonic():
+            return False
+        # pasó el tiempo de espera: un SELECT 1 antes de volver a mandarle tráfico
+        with self._lock:
+            if replica.down_until == 0.0:
+                return True
+            try:
+                with replica.engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            except Exception:
+                self.mark_down(replica)
+                return False
+            replica.down_until = 0.0
+            logger.warning("replica %s volvió", replica.name)
+            return True
+
+    def choose(self):
+        """A healthy replica, or None to read from the primary."""
+        healthy = [replica for replica in self.replicas if self._is_up(replica)]
+        if not healthy:
+            return None
+        if self.strategy == "least_connections":
+            start = next(self._next)
+            order = healthy[start % len(healthy):] + healthy[:start % len(healthy)]
+            return min(order, key=Replica.checked_out)
+        return healthy[next(self._next) % len(healthy)]
+
+    def _sticky(self):
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _pick(self):
+        replica = None
+        if request.method in READ_METHODS and not self._sticky():
+            replica = self.choose()
+        g.db_replica = replica
+
+    def _stick(self, response):
+        if g.get("db_wrote") and self.sticky_seconds > 0:
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + self.sticky_seconds),
+                max_age=self.sticky_seconds, httponly=True, samesite="Lax",
+            )
+        return response
+
+    def _retry_on_primary(self, error):
+        if not g.pop("db_replica_failed", False) or request.method not in READ_METHODS:
+            raise error
+        self.session.rollback()
+        g.db_replica = None
+        view = current_app.view_functions[request.endpoint]
+        return current_app.ensure_sync(view)(**request.view_args)
+
+    def read_engine(self, clause):
+        """Engine for a read of the current request, or None for the primary."""
+        if not has_request_context():
+            return None
+        if isinstance(clause, UpdateBase):
+            # INSERT/UPDATE/DELETE sin flush (session.execute(delete(...)))
+            _mark_write()
+            return None
+        replica = g.get("db_replica")
+        return None if replica is None else replica.engine
+
+    def snapshot(self):
+        return [
+            {"name": replica.name, "healthy": replica.down_until < time.monotonic(), "checked_out": replica.checked_out()}
+            for replica in self.replicas
+        ]
+
+
+replica_router = ReplicaRouter()
+
+
+def _mark_write(*args):
+    # lo que queda de la petición va al primario y la respuesta lleva la cookie
+    if has_request_context():
+        g.db_wrote = True
+        g.db_replica = None
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends the reads of GET requests to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            engine = replica_router.read_engine(clause)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,97 @@
+"""
+Read routes shared by every catalog model.
+
+Each Resource is registered once with register_resources() and gets the same
+code path as the others:
+
+    GET /<name>          keyset pages, filters and ?fields (utils.keyset_page),
+                         or NDJSON / chunked JSON with ?stream=1
+    GET /<name>/<id>     one row through the resource cache (cache.py)
+    GET /<name>/top      leaderboard by favorites_count (favorites.py)
+
+List and detail answer conditional GETs from the table version
+(conditional.py) unless the resource is created with versioned=False. With
+CATALOG_MODE on, the versioned ones are read from the in-memory snapshot
+(catalog.py) instead of the database.
+"""
+from functools import partial
+from flask import jsonify, request
+from cache import cache
+from catalog import catalog
+from conditional import conditional_get, request_version
+from favorites import top_resources
+from models import People, Planets, Vehicles, Users
+from utils import keyset_page, stream_rows, wants_stream
+
+
+class Resource:
+
+    def __init__(self, model, name, singular, not_found=None, versioned=True, detail=True, top=True):
+        self.model = model
+        self.name = name
+        self.singular = singular
+        self.not_found = not_found
+        self.versioned = versioned
+        self.detail = detail
+        self.top = top
+
+    def list_view(self, session):
+        def view():
+            if wants_stream(request):
+                return stream_rows(session, self.model, request)
+            response = catalog.list_response(self.model, request.args)
+            if response is not None:
+                return response
+            return jsonify(keyset_page(session, self.model, request.args)), 200
+        return view
+
+    def detail_view(self, session):
+        def view(id):
+            response = catalog.detail_response(self.model, id, self.not_found)
+            if response is not None:
+                return response
+            result = cache.get(session, self.model, id, request_version(self.model))
+            if result is None:
+                return jsonify({"msg": self.not_found}), 404
+            return jsonify({"msg": "ok", "result": result}), 200
+        return view
+
+    def top_view(self, session):
+        def view():
+            return jsonify({"msg": "ok", "results": top_resources(session, self.model, request.args)}), 200
+        return view
+
+    def register(self, app, session):
+        def add(rule, endpoint, view):
+            if self.versioned:
+                view = conditional_get(session, self.model, partial(catalog.version, session, self.model))(view)
+            app.add_url_rule(rule, endpoint, view, methods=["GET"])
+
+        # los nombres de endpoint son los que usan LOG_SAMPLE_RATES y las métricas
+        add("/" + self.name, "get_all_" + self.name, self.list_view(session))
+        if self.top:
+            app.add_url_rule("/" + self.name + "/top", "get_top_" + self.name, self.top_view(session), methods=["GET"])
+        if self.detail:
+            add("/" + self.name + "/<int:id>", "get_one_" + self.singular, self.detail_view(session))
+
+
+RESOURCES = (
+    Resource(People, "people", "people", "el personaje no existe"),
+    Resource(Planets, "planets", "planet", "el planeta no existe"),
+    Resource(Vehicles, "vehicles", "vehicle", "el vehículo no existe"),
+    # /users no tiene detalle ni ranking y no se versiona
+    Resource(Users, "users", "user", versioned=False, detail=False, top=False),
+)
+
+
+def cached_models(resources=RESOURCES):
+    return tuple(resource.model for resource in resources if resource.detail)
+
+
+def catalog_models(resources=RESOURCES):
+    return tuple(resource.model for resource in resources if resource.versioned)
+
+
+def register_resources(app, session, resources=RESOURCES):
+    for resource in resources:
+        resource.register(app, session)
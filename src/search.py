@@ -0,0 +1,89 @@
+"""
+Name search over People, Planets and Vehicles (/search?q=...&type=...).
+
+Each database uses the indexes created by migration d41c2e7b9a10:
+- Postgres: GIN index on to_tsvector('simple', name) for whole words plus a
+  pg_trgm GIN index so partial names ("sky" -> "Skywalker") also use an index.
+- SQLite: an FTS5 table per model (people_fts, ...) kept in sync by triggers,
+  queried with prefix terms.
+- Anything else (or SQLite without the FTS tables, e.g. after db.create_all())
+  falls back to a LIKE scan.
+"""
+import re
+from sqlalchemy import select, func, or_, text, column, literal_column, Integer
+from utils import APIException, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from models import People, Planets, Vehicles
+
+SEARCHABLE = {
+    "people": People,
+    "planets": Planets,
+    "vehicles": Vehicles,
+}
+
+_fts_tables = {}
+
+
+def parse_search_args(args):
+    q = (args.get("q") or "").strip()
+    if not q:
+        raise APIException("q es obligatorio", status_code=400)
+    types = [name.strip() for name in args.get("type", ",".join(SEARCHABLE)).split(",") if name.strip()]
+    unknown = [name for name in types if name not in SEARCHABLE]
+    if unknown:
+        raise APIException("tipos no válidos: " + ", ".join(unknown), status_code=400)
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIException("limit debe ser entero", status_code=400)
+    return q, types, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _has_fts_table(session, model):
+    name = model.__tablename__ + "_fts"
+    if name not in _fts_tables:
+        found = session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+        ).first()
+        _fts_tables[name] = found is not None
+    return _fts_tables[name]
+
+
+def _fts5_query(q):
+    # cada palabra como prefijo entre comillas: nada del input se interpreta como sintaxis FTS
+    words = re.findall(r"\w+", q)
+    return " ".join('"' + word + '"*' for word in words)
+
+
+def _like_pattern(q):
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def name_condition(session, model, q):
+    dialect = session.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        # mismo texto que la expresión del índice ix_<tabla>_name_tsv para que el planner lo use
+        config = literal_column("'simple'::regconfig")
+        return or_(
+            func.to_tsvector(config, model.name).op("@@")(func.plainto_tsquery(config, q)),
+            model.name.ilike(_like_pattern(q), escape="\\"),
+        )
+
+    if dialect == "sqlite" and _has_fts_table(session, model):
+        match = _fts5_query(q)
+        if not match:
+            return model.id.is_(None)
+        fts = model.__tablename__ + "_fts"
+        ids = text("SELECT rowid FROM " + fts + " WHERE " + fts + " MATCH :match").bindparams(match=match)
+        return model.id.in_(ids.columns(column("rowid", Integer)))
+
+    return model.name.ilike(_like_pattern(q), escape="\\")
+
+
+def search(session, q, types, limit):
+    results = {}
+    for name in types:
+        model = SEARCHABLE[name]
+        stmt = select(*model.public_columns()).where(name_condition(session, model, q)).order_by(model.id).limit(limit)
+        results[name] = [model.row_to_dict(row) for row in session.execute(stmt)]
+    return results
@@ -1,4 +1,19 @@
-from flask import jsonify, url_for
+from flask import jsonify, url_for, json, Response, stream_with_context
+from sqlalchemy import select
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Parámetros de la query string que no son filtros
+RESERVED_ARGS = ("after", "limit", "fields", "stream")
+RANGE_OPERATORS = {
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+}
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +30,131 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def parse_page_args(args):
+    """Lee ?after=<id>&limit=<n> de la query string."""
+    try:
+        after = int(args.get("after", 0))
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIException("after y limit deben ser enteros", status_code=400)
+    if after < 0 or limit < 1:
+        raise APIException("after debe ser >= 0 y limit >= 1", status_code=400)
+    return after, min(limit, MAX_PAGE_SIZE)
+
+def parse_fields(model, args):
+    """Lee ?fields=name,height; sin proyección devuelve todos los campos públicos."""
+    raw = args.get("fields")
+    if not raw:
+        return model.public_keys
+    keys = [key.strip() for key in raw.split(",") if key.strip()]
+    unknown = [key for key in keys if key not in model.public_fields]
+    if unknown:
+        raise APIException("campos no válidos: " + ", ".join(unknown), status_code=400)
+    # el id siempre va incluido porque es el cursor
+    if "id" not in keys:
+        keys.insert(0, "id")
+    return tuple(keys)
+
+def apply_filters(model, args, stmt):
+    """Filtros por columna: ?gender=female (igualdad) y ?height_gt=180 (rangos, solo numéricos)."""
+    for key in args:
+        if key in RESERVED_ARGS:
+            continue
+        name, operator = key, None
+        if key not in model.public_fields and "_" in key:
+            name, operator = key.rsplit("_", 1)
+        if name not in model.public_fields or (operator is not None and operator not in RANGE_OPERATORS):
+            raise APIException("filtro no válido: " + key, status_code=400)
+
+        column = getattr(model, model.public_fields[name])
+        python_type = column.type.python_type
+        if operator is not None and python_type is not int:
+            raise APIException("el filtro " + key + " solo aplica a campos numéricos", status_code=400)
+        try:
+            value = python_type(args[key])
+        except ValueError:
+            raise APIException("valor no válido para " + key, status_code=400)
+
+        if operator is None:
+            stmt = stmt.where(column == value)
+        else:
+            stmt = stmt.where(RANGE_OPERATORS[operator](column, value))
+    return stmt
+
+def keyset_page(session, model, args):
+    """Pagina por id (keyset) en lugar de cargar toda la tabla."""
+    after, limit = parse_page_args(args)
+    keys = parse_fields(model, args)
+
+    # solo columnas: las filas llegan como tuplas, sin armar objetos ORM
+    stmt = select(*model.public_columns(keys))
+    stmt = apply_filters(model, args, stmt)
+    # pedimos una fila de más para saber si hay página siguiente
+    stmt = stmt.where(model.id > after).order_by(model.id).limit(limit + 1)
+
+    rows = session.execute(stmt).all()
+    results = [model.row_to_dict(row, keys) for row in rows[:limit]]
+
+    next_cursor = results[-1]["id"] if len(rows) > limit else None
+    return {
+        "msg": "ok",
+        "results": results,
+        "next": next_cursor
+    }
+
+def wants_stream(request):
+    """Modo exportación: ?stream=1 o Accept: application/x-ndjson."""
+    if request.args.get("stream") in ("1", "true"):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def _stream_statement(model, args):
+    # se valida todo antes de armar la Response: un error acá todavía puede ser un 400
+    after = parse_page_args(args)[0]
+    keys = parse_fields(model, args)
+
+    stmt = select(*model.public_columns(keys))
+    stmt = apply_filters(model, args, stmt)
+    # yield_per usa un cursor del lado del servidor: las filas llegan por lotes
+    stmt = stmt.where(model.id > after).order_by(model.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+    return stmt, keys
+
+def _iter_rows(session, model, stmt, keys):
+    for row in session.execute(stmt):
+        yield model.row_to_dict(row, keys)
+
+def stream_rows(session, model, request):
+    """Exporta toda la tabla sin armar la lista completa en memoria.
+
+    Con Accept: application/x-ndjson devuelve una fila JSON por línea; si no,
+    devuelve el mismo sobre {"msg", "results"} de siempre pero en trozos.
+    """
+    stmt, keys = _stream_statement(model, request.args)
+    rows = _iter_rows(session, model, stmt, keys)
+
+    if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+        def generate():
+            for row in rows:
+                yield json.dumps(row) + "\n"
+        return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+    def generate():
+        yield '{"msg": "ok", "results": ['
+        first = True
+        for row in rows:
+            yield ("" if first else ",") + json.dumps(row)
+            first = False
+        yield "]}"
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    # el rol api no registra Flask-Admin (ver create_app)
+    links = ['/admin/'] if 'admin.index' in app.view_functions else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
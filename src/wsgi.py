@@ -1,7 +1,11 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
-from app import app as application
+import os
+from app import create_app
+
+# APP_ROLE=api en los workers que solo atienden la API (ver app.py)
+application = create_app(os.getenv("APP_ROLE", "admin"))
 
 if __name__ == "__main__":
     application.run()